@@ -0,0 +1,3 @@
+-- Indexes for filtering the expense and payment lists by date.
+ALTER TABLE budget_payments ADD INDEX date_written (date_written);
+ALTER TABLE budget_expenses ADD INDEX date_incurred (date_incurred);
@@ -0,0 +1,19 @@
+-- Stored totals for each account's posted payments and each budget's
+-- expenses, kept up to date by the budget module.
+ALTER TABLE budget_accounts
+  ADD COLUMN posted_amount NUMERIC(9,2) NOT NULL DEFAULT 0 AFTER initial_balance;
+ALTER TABLE budget_budgets
+  ADD COLUMN spent NUMERIC(9,2) NOT NULL DEFAULT 0 AFTER starting_amount;
+
+-- Fill in the totals (the same as scripts/budget_totals.py --rebuild).
+UPDATE budget_budgets
+SET spent = (
+  SELECT IFNULL(SUM(cost), 0)
+  FROM budget_expenses
+  WHERE budget_expenses.budget_id = budget_budgets.budget_id);
+UPDATE budget_accounts
+SET posted_amount = (
+  SELECT IFNULL(SUM(amount), 0)
+  FROM budget_payments
+  WHERE budget_payments.account_id = budget_accounts.account_id
+    AND date_posted IS NOT NULL);
@@ -0,0 +1,13 @@
+-- Index graduation_year and compare it against a constant in the current and
+-- alumni member views, so that they can use the index.
+ALTER TABLE members ADD INDEX graduation_year (graduation_year);
+
+CREATE OR REPLACE VIEW members_alumni AS
+  SELECT user_id
+  FROM members
+  WHERE graduation_year <= YEAR(NOW() - INTERVAL 6 MONTH);
+
+CREATE OR REPLACE VIEW members_current AS
+  SELECT user_id
+  FROM members
+  WHERE graduation_year > YEAR(NOW() - INTERVAL 6 MONTH);
@@ -0,0 +1,5 @@
+-- Indexes for finding current, past and future office assignments, and a
+-- user's current assignments.
+ALTER TABLE office_assignments
+  ADD INDEX assignment_dates (start_date, end_date),
+  ADD INDEX user_assignments (user_id, start_date);
@@ -0,0 +1,13 @@
+-- Indexes for values that rows are looked up by.
+
+-- Account creation links.
+ALTER TABLE members ADD INDEX create_account_key (create_account_key);
+
+-- Password reset links. Older copies of the schema were missing these columns.
+ALTER TABLE users
+  ADD COLUMN IF NOT EXISTS password_reset_key CHAR(32),
+  ADD COLUMN IF NOT EXISTS password_reset_expiration DATETIME;
+ALTER TABLE users ADD INDEX password_reset_key (password_reset_key);
+
+-- A payee's unpaid expenses.
+ALTER TABLE budget_expenses ADD INDEX payee_expenses (payee_id, payment_id);
@@ -0,0 +1,20 @@
+-- Record when rows last changed, so that pages built from these tables can
+-- tell whether they have changed since a browser last fetched them. Each
+-- table's column has a different name so that NATURAL JOINs don't join on it.
+ALTER TABLE members
+  ADD COLUMN member_updated_at TIMESTAMP(6) NOT NULL
+    DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)
+    AFTER create_account_key,
+  ADD INDEX member_updated_at (member_updated_at);
+ALTER TABLE users
+  ADD COLUMN user_updated_at TIMESTAMP(6) NOT NULL
+    DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+ALTER TABLE office_assignments
+  ADD COLUMN assignment_updated_at TIMESTAMP(6) NOT NULL
+    DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+ALTER TABLE budget_accounts
+  ADD COLUMN account_updated_at TIMESTAMP(6) NOT NULL
+    DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+ALTER TABLE budget_budgets
+  ADD COLUMN budget_updated_at TIMESTAMP(6) NOT NULL
+    DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
@@ -1,6 +1,8 @@
 /*
  * This is the schema for the database.
  * If you make any schema changes, you must also reflect those changes here!
+ * Existing databases are changed with migrations in database/migrations (see
+ * scripts/migrate.py); record each migration at the end of this file.
  */
 
 -- TODO(dkong): remove this table.
@@ -31,8 +33,16 @@ CREATE TABLE members (
   room_number INTEGER,
   major VARCHAR(255),
   create_account_key CHAR(32),
+  -- When the row last changed. Pages built from this table use it to tell
+  -- whether they have changed (see http_cache_utils). Each table's column has
+  -- a different name so that NATURAL JOINs don't join on it.
+  member_updated_at TIMESTAMP(6) NOT NULL
+    DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
   PRIMARY KEY (user_id),
   UNIQUE (uid),
+  INDEX (member_updated_at), -- for the member list version
+  INDEX (graduation_year), -- for the members_current and members_alumni views
+  INDEX (create_account_key), -- for account creation links
   FOREIGN KEY (member_type) REFERENCES membership_types (member_type)
 );
 
@@ -43,8 +53,13 @@ CREATE TABLE users (
   username VARCHAR(32) NOT NULL,
   password_hash VARCHAR(255) NOT NULL,
   lastlogin DATETIME,
+  password_reset_key CHAR(32),
+  password_reset_expiration DATETIME,
+  user_updated_at TIMESTAMP(6) NOT NULL -- see members.member_updated_at
+    DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
   PRIMARY KEY (user_id),
   UNIQUE (username),
+  INDEX (password_reset_key), -- for password reset links
   FOREIGN KEY (user_id) REFERENCES members (user_id)
     ON DELETE CASCADE
 );
@@ -83,7 +98,13 @@ CREATE TABLE office_assignments (
   user_id INTEGER NOT NULL,
   start_date DATE NOT NULL,
   end_date DATE NOT NULL,
+  assignment_updated_at TIMESTAMP(6) NOT NULL -- see members.member_updated_at
+    DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
   PRIMARY KEY (assignment_id),
+  -- For finding current, past and future assignments.
+  INDEX assignment_dates (start_date, end_date),
+  -- For finding a user's current assignments when loading their permissions.
+  INDEX user_assignments (user_id, start_date),
   -- The tuple (office_id, user_id) is NOT required to be unique.
   -- It is possible for someone to hold the same position multiple times.
   FOREIGN KEY (office_id) REFERENCES offices (office_id)
@@ -214,6 +235,11 @@ CREATE TABLE budget_accounts (
   account_id INTEGER NOT NULL AUTO_INCREMENT,
   account_name VARCHAR(255) NOT NULL,
   initial_balance NUMERIC(9,2) NOT NULL,
+  -- Total of all posted payments from this account, kept up to date by the
+  -- budget module (see scripts/budget_totals.py).
+  posted_amount NUMERIC(9,2) NOT NULL DEFAULT 0,
+  account_updated_at TIMESTAMP(6) NOT NULL -- see members.member_updated_at
+    DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
   PRIMARY KEY (account_id)
 );
 
@@ -232,6 +258,11 @@ CREATE TABLE budget_budgets (
   budget_name VARCHAR(32) NOT NULL,
   fyear_id INTEGER NOT NULL,
   starting_amount NUMERIC(9,2) NOT NULL,
+  -- Total cost of all expenses from this budget, kept up to date by the
+  -- budget module (see scripts/budget_totals.py).
+  spent NUMERIC(9,2) NOT NULL DEFAULT 0,
+  budget_updated_at TIMESTAMP(6) NOT NULL -- see members.member_updated_at
+    DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
   PRIMARY KEY (budget_id),
   FOREIGN KEY (fyear_id) REFERENCES budget_fyears (fyear_id)
 );
@@ -254,6 +285,7 @@ CREATE TABLE budget_payments (
   payee_id INTEGER, -- not strictly necessary, but hard to derive from budget_expenses
   check_no VARCHAR(10), -- only used for checks (duh)
   PRIMARY KEY (payment_id),
+  INDEX (date_written), -- for filtering the payment list by date
   FOREIGN KEY (account_id) REFERENCES budget_accounts (account_id),
   FOREIGN KEY (payee_id) REFERENCES budget_payees (payee_id)
 );
@@ -268,6 +300,8 @@ CREATE TABLE budget_expenses (
   payment_id INTEGER, -- null until the expense gets a matching payment
   payee_id INTEGER, -- used to keep track of who to reimburse
   PRIMARY KEY (expense_id),
+  INDEX (date_incurred), -- for filtering the expense list by date
+  INDEX payee_expenses (payee_id, payment_id), -- for a payee's unpaid expenses
   FOREIGN KEY (budget_id) REFERENCES budget_budgets (budget_id),
   FOREIGN KEY (payment_id) REFERENCES budget_payments (payment_id),
   FOREIGN KEY (payee_id) REFERENCES budget_payees (payee_id)
@@ -275,15 +309,19 @@ CREATE TABLE budget_expenses (
 
 -- VIEWS
 
+-- Members are current until July 1st of their graduation year. Comparing
+-- graduation_year against a constant (rather than building a date from it)
+-- lets these views use the index on graduation_year: YEAR(NOW() - INTERVAL 6
+-- MONTH) is the last graduation year which has already passed July 1st.
 CREATE VIEW members_alumni AS
   SELECT user_id
   FROM members
-  WHERE NOW() >= CONCAT(graduation_year, '-07-01');
+  WHERE graduation_year <= YEAR(NOW() - INTERVAL 6 MONTH);
 
 CREATE VIEW members_current AS
   SELECT user_id
   FROM members
-  WHERE NOW() < CONCAT(graduation_year, '-07-01');
+  WHERE graduation_year > YEAR(NOW() - INTERVAL 6 MONTH);
 
 CREATE VIEW members_extra AS
   SELECT user_id,
@@ -303,3 +341,22 @@ CREATE VIEW office_assignments_past AS
   SELECT assignment_id
   FROM office_assignments
   WHERE start_date < NOW() AND end_date < NOW();
+
+-- MIGRATIONS
+
+-- Migrations (in database/migrations) which have been applied. This schema
+-- already includes the changes made by every migration listed below.
+CREATE TABLE schema_migrations (
+  version INTEGER NOT NULL,
+  name VARCHAR(255) NOT NULL,
+  applied_at DATETIME NOT NULL,
+  PRIMARY KEY (version)
+);
+
+INSERT INTO schema_migrations (version, name, applied_at) VALUES
+  (1, 'budget_ledger_indexes', NOW()),
+  (2, 'budget_totals', NOW()),
+  (3, 'current_member_views', NOW()),
+  (4, 'office_assignment_indexes', NOW()),
+  (5, 'lookup_indexes', NOW()),
+  (6, 'updated_at', NOW());
@@ -3,16 +3,22 @@
 import datetime
 import flask
 import http.client
-import sqlalchemy
+import os
+import time
 import traceback
 
 try:
   from ruddock import config
 except ImportError:
   from ruddock import default_config as config
+from ruddock import cache_utils
 from ruddock import constants
+from ruddock import db_utils
 from ruddock import email_templates
 from ruddock import email_utils
+from ruddock import hash_utils
+from ruddock import http_cache_utils
+from ruddock import query_utils
 from ruddock.modules import account
 from ruddock.modules import admin
 from ruddock.modules import auth
@@ -67,27 +73,63 @@ def init(environment_name):
   app.config["SECRET_KEY"] = environment.secret_key
   app.config["MEDIA_FOLDER"] = environment.media_folder
 
+  # Create the engine (and its connection pool) shared by every request
+  # handled by this process.
+  db_utils.init_engine(environment)
+  # Password hashing runs on a bounded pool of threads.
+  hash_utils.init_pool(environment)
+  # Emails are delivered in the background, and spooled to disk until then.
+  email_spool_dir = environment.email_spool_dir
+  if email_spool_dir is None:
+    email_spool_dir = os.path.join(app.instance_path, "email_spool")
+  email_utils.init_queue(email_spool_dir)
+
+  # Statements slower than this (in seconds) go to the slow query log.
+  app.config["SLOW_QUERY_THRESHOLD"] = environment.slow_query_threshold
+  if environment.slow_query_log is not None:
+    query_utils.set_slow_query_log_file(environment.slow_query_log)
+
   # Maximum file upload size, in bytes.
   app.config["MAX_CONTENT_LENGTH"] = constants.MAX_CONTENT_LENGTH
 
   # Update jinja global functions
   app.jinja_env.globals.update(
-      current_year=lambda: datetime.datetime.now().year)
+      current_year=lambda: datetime.datetime.now().year,
+      get_queries=query_utils.get_queries,
+      get_query_summary=query_utils.get_query_summary)
 
 @app.before_request
 def before_request():
   """Logic executed before request is processed."""
-  # Create database engine object.
-  engine = sqlalchemy.create_engine(app.config["DB_URI"], convert_unicode=True)
-  # Connect to the database and publish it in flask.g
-  flask.g.db = engine.connect()
+  flask.g.request_start = time.perf_counter()
+  flask.g.queries = []
+  # Permissions and helper results are memoized per request (flask.g may
+  # outlive a single request when an application context is pushed, as in
+  # the tests).
+  flask.g.pop('permissions', None)
+  cache_utils.clear_request_memo()
+  # Publish a database connection in flask.g. A connection is only checked
+  # out of the pool once the request actually runs a query.
+  flask.g.db = db_utils.LazyConnection()
+
+@app.after_request
+def after_request(response):
+  """Logic executed after a response has been generated."""
+  request_start = flask.g.get("request_start")
+  request_duration = None
+  if request_start is not None:
+    request_duration = time.perf_counter() - request_start
+  response.headers["Server-Timing"] = query_utils.format_server_timing(
+      request_duration)
+  return http_cache_utils.set_static_cache_headers(response)
 
 @app.teardown_request
 def teardown_request(exception):
   """Logic executed after every request is finished."""
-  # Close database connection.
+  # Return the database connection to the pool (if one was used).
   db = getattr(flask.g, "db", None)
   if db is not None:
+    db_utils.pool_stats.record_request(db.checkouts > 0)
     db.close()
 
 # Error handlers
@@ -101,6 +143,13 @@ def access_forbidden(error):
   """Handles a 403 access forbidden error."""
   return flask.render_template("403.html"), http.client.FORBIDDEN
 
+@app.errorhandler(hash_utils.HashPoolFullError)
+def hash_pool_full(error):
+  """Handles a login or password change arriving while the server is busy."""
+  return (flask.render_template("503.html"),
+      http.client.SERVICE_UNAVAILABLE,
+      {"Retry-After": str(constants.BUSY_RETRY_AFTER)})
+
 @app.errorhandler(http.client.INTERNAL_SERVER_ERROR)
 def internal_server_error(error):
   """Handles a 500 internal server error response.
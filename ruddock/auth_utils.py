@@ -4,15 +4,30 @@ authentication and authorization, including logins and permissions.
 """
 
 import hashlib
+import hmac
+import os
 import binascii
 import string
 import sqlalchemy
 import flask
 
+from ruddock import cache_utils
+from ruddock.cache_utils import request_memoized
 from ruddock import constants
+from ruddock import hash_utils
 from ruddock.resources import Permissions
 from ruddock import misc_utils
 
+# Maps user_id to a frozenset of that user's permissions.
+permission_cache = cache_utils.Cache(constants.PERMISSION_CACHE_TTL)
+
+# Remembers recent failed login attempts, keyed by get_login_attempt_key().
+failed_login_cache = cache_utils.Cache(constants.FAILED_LOGIN_CACHE_TTL,
+    max_keys=constants.FAILED_LOGIN_CACHE_MAX_KEYS)
+# Per-process key used to digest login attempts, so the cache never holds
+# anything that could be used to check a password guess offline.
+_login_attempt_secret = os.urandom(32)
+
 class PasswordHashParser:
   """
   Class to manage parsed password hashes.
@@ -156,17 +171,27 @@ class PasswordHashParser:
     if not self.check_self():
       return False
 
+    # Hashing is slow, so it runs on the hashing pool.
+    test_hash = hash_utils.run(self.compute_hash, password)
+    # In case an error occurs.
+    if test_hash is None:
+      return False
+    return misc_utils.compare_secure_strings(test_hash, self.password_hash)
+
+  def compute_hash(self, password):
+    """
+    Applies each algorithm in turn to the password and returns the result, or
+    None if an error occurs.
+    """
     test_hash = password
-    true_hash = self.password_hash
     for i in range(len(self.algorithms)):
       algorithm = self.algorithms[i]
       rounds = self.rounds[i]
       salt = self.salts[i]
       test_hash = hash_password(test_hash, salt, rounds, algorithm)
-      # In case an error occurs.
       if test_hash is None:
-        return False
-    return misc_utils.compare_secure_strings(test_hash, true_hash)
+        return None
+    return test_hash
 
   def is_legacy(self):
     """
@@ -204,7 +229,8 @@ def set_password(username, password):
   algorithm = constants.PWD_HASH_ALGORITHM
   rounds = constants.HASH_ROUNDS
   salt = generate_salt()
-  password_hash = hash_password(password, salt, rounds, algorithm)
+  password_hash = hash_utils.run(hash_password, password, salt, rounds,
+      algorithm)
   if password_hash is None:
     raise ValueError
 
@@ -222,6 +248,17 @@ def set_password(username, password):
   flask.g.db.execute(query, ph=full_hash, u=username)
   return
 
+def get_login_attempt_key(username, password, password_hash):
+  """
+  Returns a digest identifying an attempt to log in with a (username,
+  password) pair against the user's current password hash. Changing the
+  password changes the hash, so attempts that failed before no longer match
+  in any process.
+  """
+  message = b"\0".join([username.encode(), password.encode(),
+      password_hash.encode()])
+  return hmac.new(_login_attempt_secret, message, hashlib.sha256).hexdigest()
+
 def generate_salt():
   """Generates a pseudorandom salt."""
   return misc_utils.generate_random_string(constants.SALT_SIZE)
@@ -249,6 +286,7 @@ def check_reset_key(reset_key):
   else:
     return None
 
+@request_memoized
 def get_user_id(username):
   """Takes a username and returns the user's ID."""
   query = sqlalchemy.text("SELECT user_id FROM users WHERE username = :u")
@@ -296,6 +334,17 @@ def check_login():
   """Returns true if the user is logged in."""
   return 'username' in flask.session
 
+def get_current_user_id():
+  """
+  Returns the logged in user's ID, or None if nobody is logged in. Sessions
+  created before the ID was stored in the session are upgraded here.
+  """
+  if not check_login():
+    return None
+  if 'user_id' not in flask.session:
+    flask.session['user_id'] = get_user_id(flask.session['username'])
+  return flask.session['user_id']
+
 def login_redirect():
   """
   Redirects the user to the login page, saving the intended destination in the
@@ -310,37 +359,64 @@ def login_redirect():
   flask.flash("You must be logged in to visit this page.")
   return flask.redirect(flask.url_for('auth.login'))
 
-def get_permissions(username):
+def load_permissions(user_id):
   """
-  Returns a list with all of the permissions available to the user.
-  A list is returned because Python sets cannot be stored in cookie data.
+  Loads all of the permissions available to the user from the database,
+  bypassing the cache. Returns a frozenset.
   """
   query = sqlalchemy.text("""
     (SELECT permission_id
-      FROM users
-        NATURAL JOIN offices
-        NATURAL JOIN office_assignments
-        NATURAL JOIN office_assignments_current
+      FROM office_assignments
         NATURAL JOIN office_permissions
-      WHERE username=:u)
+      WHERE user_id = :uid
+        AND start_date < NOW() AND end_date > NOW())
     UNION
     (SELECT permission_id
-      FROM users
-        NATURAL JOIN user_permissions
-      WHERE username=:u)
+      FROM user_permissions
+      WHERE user_id = :uid)
     """)
-  result = flask.g.db.execute(query, u=username)
-  return list(row['permission_id'] for row in result)
+  result = flask.g.db.execute(query, uid=user_id)
+  return frozenset(row['permission_id'] for row in result)
+
+def get_permissions(user_id):
+  """
+  Returns a frozenset with all of the permissions available to the user. The
+  result is cached, so this only queries the database if the user's permissions
+  have not been loaded recently or have been invalidated.
+  """
+  return permission_cache.get_or_set(user_id,
+      lambda: load_permissions(user_id))
+
+def invalidate_permissions(user_id=None):
+  """
+  Discards cached permissions for the user, or for everyone if user_id is
+  None. This must be called whenever office_assignments, office_permissions, or
+  user_permissions change. Other processes pick up the change once their cached
+  entries expire (after PERMISSION_CACHE_TTL seconds).
+  """
+  permission_cache.invalidate(user_id)
+
+def get_current_permissions():
+  """
+  Returns the logged in user's permissions, or an empty frozenset if nobody is
+  logged in. The result is remembered for the rest of the request.
+  """
+  if 'permissions' not in flask.g:
+    user_id = get_current_user_id()
+    if user_id is None:
+      flask.g.permissions = frozenset()
+    else:
+      flask.g.permissions = get_permissions(user_id)
+  return flask.g.permissions
 
 def check_permission(permission):
   """Returns true if the user has the given permission."""
-  if 'permissions' not in flask.session:
-    return False
+  permissions = get_current_permissions()
   # Admins always have access to everything.
-  if Permissions.ADMIN in flask.session['permissions']:
+  if Permissions.ADMIN in permissions:
     return True
-  # Otherwise check if the permission is present in their permission list.
-  return permission in flask.session['permissions']
+  # Otherwise check if the permission is present in their permission set.
+  return permission in permissions
 
 class AdminLink:
   """Simple class to hold link information."""
@@ -374,6 +450,7 @@ def generate_admin_links():
       flask.url_for('budget.route_portal', _external=True)))
   return links
 
+@request_memoized
 def is_full_member(username):
   query = sqlalchemy.text("""
     SELECT membership_desc_short
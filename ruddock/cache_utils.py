@@ -0,0 +1,173 @@
+"""
+This module provides a simple in-process cache. Every WSGI process keeps its
+own copy of cached data, so anything cached here must either be invalidated by
+the code that changes it, or be acceptable to serve stale for up to the cache's
+time-to-live (other processes will not see the invalidation).
+
+It also provides reference_data, which caches queries on rarely changing
+tables across requests, and request_memoized, which remembers results only for
+the rest of the current request.
+"""
+
+import collections
+import functools
+import inspect
+import threading
+import time
+import flask
+
+from ruddock import constants
+from ruddock import query_utils
+
+# Sentinel for missing cache entries (None is a valid cached value).
+_missing = object()
+
+class Cache:
+  """
+  A thread-safe dict-like cache where every entry expires after a
+  time-to-live, given in seconds. If max_keys is given, at most that many
+  entries are kept; when there are more, the least recently used entries are
+  forgotten.
+  """
+  def __init__(self, ttl, max_keys=None):
+    self.ttl = ttl
+    self.max_keys = max_keys
+    self._lock = threading.Lock()
+    # Maps keys to (expiration time, value) tuples, least recently used first.
+    self._entries = collections.OrderedDict()
+
+  def get(self, key, default=None):
+    """Returns the cached value for key, or default if missing or expired."""
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        return default
+      expires, value = entry
+      if time.monotonic() >= expires:
+        del self._entries[key]
+        return default
+      self._entries.move_to_end(key)
+      return value
+
+  def set(self, key, value, ttl=None):
+    """
+    Caches value under key. The entry expires after ttl seconds, or the
+    cache's default time-to-live if ttl is None.
+    """
+    if ttl is None:
+      ttl = self.ttl
+    with self._lock:
+      self._entries.pop(key, None)
+      self._entries[key] = (time.monotonic() + ttl, value)
+      if self.max_keys is not None and len(self._entries) > self.max_keys:
+        self._entries.popitem(last=False)
+
+  def get_or_set(self, key, compute, ttl=None):
+    """
+    Returns the cached value for key. If there is none, compute() is called
+    and its result is cached and returned.
+    """
+    value = self.get(key, _missing)
+    if value is _missing:
+      value = compute()
+      self.set(key, value, ttl)
+    return value
+
+  def invalidate(self, key=None):
+    """Removes the entry for key, or every entry if key is None."""
+    with self._lock:
+      if key is None:
+        self._entries.clear()
+      else:
+        self._entries.pop(key, None)
+
+# Cache for queries on reference tables, see reference_data.
+reference_cache = Cache(constants.REFERENCE_DATA_TTL)
+# Maps table names to the keys of the reference_cache entries read from them.
+_reference_keys = {}
+_reference_keys_lock = threading.Lock()
+
+def get_call_key(fn, signature, args, kwargs):
+  """
+  Returns a key identifying a call of fn. Arguments are bound to the
+  signature, so that f(1) and f(x=1) have the same key.
+  """
+  arguments = signature.bind(*args, **kwargs)
+  arguments.apply_defaults()
+  return (fn.__module__, fn.__qualname__, tuple(arguments.arguments.items()))
+
+def reference_data(*tables):
+  """
+  Decorator for helpers which only read from the given rarely changing
+  tables. Results are cached for each distinct set of arguments, shared by
+  every request in this process, until invalidate_reference_data() is called
+  for one of the tables or constants.REFERENCE_DATA_TTL seconds pass. Results
+  are shared between callers and must not be modified.
+  """
+  def decorator(fn):
+    signature = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    def wrapped_function(*args, **kwargs):
+      key = get_call_key(fn, signature, args, kwargs)
+      with _reference_keys_lock:
+        for table in tables:
+          _reference_keys.setdefault(table, set()).add(key)
+      return reference_cache.get_or_set(key, lambda: fn(*args, **kwargs))
+    return wrapped_function
+  return decorator
+
+def invalidate_reference_data(*tables):
+  """
+  Discards cached results read from any of the given tables. Code that writes
+  to a table read by a reference_data helper must call this.
+  """
+  with _reference_keys_lock:
+    keys = set()
+    for table in tables:
+      keys.update(_reference_keys.pop(table, ()))
+  for key in keys:
+    reference_cache.invalidate(key)
+
+# Statement types which don't change any data.
+READ_STATEMENTS = {'SELECT', 'SHOW', 'EXPLAIN', 'DESCRIBE'}
+
+def request_memoized(fn):
+  """
+  Decorator which remembers fn's result for each distinct set of arguments
+  until the end of the current request, so helpers that are called several
+  times per request only query the database once. Results are shared between
+  callers and must not be modified.
+
+  Running any statement that may change data clears every remembered result,
+  so a helper called after a write never returns data from before it.
+  """
+  signature = inspect.signature(fn)
+
+  @functools.wraps(fn)
+  def wrapped_function(*args, **kwargs):
+    if not flask.has_app_context():
+      return fn(*args, **kwargs)
+    key = get_call_key(fn, signature, args, kwargs)
+    try:
+      memo = flask.g.setdefault('memo', {})
+      value = memo.get(key, _missing)
+    except TypeError:
+      # Unhashable arguments can't be remembered.
+      return fn(*args, **kwargs)
+    if value is _missing:
+      value = fn(*args, **kwargs)
+      flask.g.setdefault('memo', {})[key] = value
+    return value
+  return wrapped_function
+
+def clear_request_memo():
+  """Forgets every result remembered by request_memoized."""
+  flask.g.pop('memo', None)
+
+def _clear_request_memo_on_write(record):
+  statement_type = record.statement.lstrip('( ').split(' ', 1)[0].upper()
+  if statement_type not in READ_STATEMENTS:
+    clear_request_memo()
+
+query_utils.listeners.append(_clear_request_memo_on_write)
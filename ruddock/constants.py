@@ -13,3 +13,59 @@ PWD_RESET_KEY_LENGTH = 32
 # Length of time before recovery key expires, in minutes.
 PWD_RESET_KEY_EXPIRATION = 1 * 24 * 60
 CREATE_ACCOUNT_KEY_LENGTH = 32
+
+# Maximum number of members that can be added with a single upload.
+MAX_NEW_MEMBERS = 1000
+
+# Default and maximum number of results returned by member search endpoints.
+MEMBER_SEARCH_LIMIT = 50
+MAX_MEMBER_SEARCH_LIMIT = 200
+
+# Caching constants, in seconds.
+# How long the in-memory member name search index may be used before being
+# rebuilt (other processes' changes to members become visible after this).
+MEMBER_INDEX_TTL = 10 * 60
+# How long a user's permissions may be cached before being reloaded (changes
+# made by other processes, or assignments starting or ending, become visible
+# after this).
+PERMISSION_CACHE_TTL = 5 * 60
+# How long rarely changing reference tables (membership types, offices, fiscal
+# years, accounts, rotation buckets and rooms) may be cached. Changes made
+# outside the website's write paths become visible after this.
+REFERENCE_DATA_TTL = 15 * 60
+# Longest time the rendered list of current offices on the government page may
+# be cached (it also expires whenever an assignment starts or ends, and is
+# discarded when this process changes an assignment).
+GOVERNMENT_PAGE_TTL = 10 * 60
+# How long a failed login attempt is remembered, so that repeating the exact
+# same username and password is rejected without hashing the password again.
+FAILED_LOGIN_CACHE_TTL = 5 * 60
+# Most failed login attempts remembered by each process at once.
+FAILED_LOGIN_CACHE_MAX_KEYS = 10000
+# Number of seconds clients are asked to wait before retrying when the server
+# is too busy to hash their password.
+BUSY_RETRY_AFTER = 5
+
+# Login throttling. Each username and each IP address may make a burst of
+# login attempts, after which attempts are allowed at the given rate (per
+# second).
+LOGIN_USERNAME_BURST = 5
+LOGIN_USERNAME_RATE = 1 / 60
+LOGIN_IP_BURST = 20
+LOGIN_IP_RATE = 10 / 60
+
+# Email delivery queue constants.
+# Maximum number of messages sent in one go over a connection.
+EMAIL_BATCH_SIZE = 50
+# Seconds without any messages before the SMTP connection is closed.
+EMAIL_IDLE_TIMEOUT = 30
+# Number of delivery attempts before a message is given up on, and the delay
+# before the first retry, in seconds (doubled for each further retry).
+EMAIL_MAX_ATTEMPTS = 5
+EMAIL_RETRY_DELAY = 2
+# Spooled messages untouched for this many seconds are assumed to have been
+# abandoned by a process that stopped, and are delivered by the next process
+# to start. This must be much longer than the total retry delay.
+EMAIL_SPOOL_RECOVERY_AGE = 10 * 60
+# Seconds to wait for queued messages to be delivered when a process exits.
+EMAIL_EXIT_TIMEOUT = 10
@@ -0,0 +1,159 @@
+"""
+This module owns the database engine for the current process. The engine (and
+its connection pool) is created once by init_engine() and then shared by every
+request handled by this process, so requests reuse open connections instead of
+performing a new MySQL handshake each time.
+"""
+
+import threading
+import time
+import sqlalchemy
+
+from ruddock import query_utils
+
+# The process-wide engine, set by init_engine().
+_engine = None
+
+class PoolStats:
+  """
+  Keeps track of how many connections have been checked out of the pool, how
+  long callers had to wait for them, and how many requests actually needed
+  one. Instances are safe to share between threads.
+  """
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.checkouts = 0
+    self.total_wait = 0.0
+    self.max_wait = 0.0
+    self.requests = 0
+    self.requests_with_db = 0
+
+  def record_checkout(self, wait):
+    """Records a checkout that took wait seconds."""
+    with self._lock:
+      self.checkouts += 1
+      self.total_wait += wait
+      self.max_wait = max(self.max_wait, wait)
+
+  def record_request(self, used_db):
+    """Records a finished request and whether it used the database."""
+    with self._lock:
+      self.requests += 1
+      if used_db:
+        self.requests_with_db += 1
+
+  def reset(self):
+    """Clears all recorded statistics."""
+    with self._lock:
+      self.checkouts = 0
+      self.total_wait = 0.0
+      self.max_wait = 0.0
+      self.requests = 0
+      self.requests_with_db = 0
+
+  def as_dict(self):
+    """Returns the recorded statistics as a dict."""
+    with self._lock:
+      average_wait = self.total_wait / self.checkouts if self.checkouts else 0.0
+      return {
+        'checkouts': self.checkouts,
+        'total_wait': self.total_wait,
+        'max_wait': self.max_wait,
+        'average_wait': average_wait,
+        'requests': self.requests,
+        'requests_with_db': self.requests_with_db,
+      }
+
+pool_stats = PoolStats()
+
+def init_engine(environment):
+  """
+  Creates the engine for this process using the pool settings of the provided
+  environment. Any previously created engine is disposed of.
+  """
+  global _engine
+  if _engine is not None:
+    _engine.dispose()
+  _engine = sqlalchemy.create_engine(environment.db_uri,
+      convert_unicode=True,
+      pool_size=environment.db_pool_size,
+      max_overflow=environment.db_max_overflow,
+      pool_recycle=environment.db_pool_recycle,
+      pool_pre_ping=environment.db_pool_pre_ping)
+  query_utils.instrument_engine(_engine)
+  pool_stats.reset()
+  return _engine
+
+def get_engine():
+  """Returns the engine for this process. init_engine() must be called first."""
+  if _engine is None:
+    raise RuntimeError("Database engine has not been initialized.")
+  return _engine
+
+def connect():
+  """Checks out a connection from the pool, recording how long it took."""
+  engine = get_engine()
+  start = time.perf_counter()
+  connection = engine.connect()
+  pool_stats.record_checkout(time.perf_counter() - start)
+  return connection
+
+class LazyConnection:
+  """
+  Stands in for a database connection, but only checks one out of the pool the
+  first time it is actually used. Pages that never run a query therefore never
+  touch MySQL.
+
+  The number of connections checked out through this object is available as
+  the checkouts attribute.
+  """
+  def __init__(self):
+    self._connection = None
+    self.checkouts = 0
+
+  @property
+  def connection(self):
+    """Returns the underlying connection, checking one out if necessary."""
+    if self._connection is None:
+      self._connection = connect()
+      self.checkouts += 1
+    return self._connection
+
+  @property
+  def in_use(self):
+    """True if a connection is currently checked out."""
+    return self._connection is not None
+
+  def execute(self, *args, **kwargs):
+    return self.connection.execute(*args, **kwargs)
+
+  def begin(self):
+    return self.connection.begin()
+
+  def __getattr__(self, name):
+    # Anything else is passed through to the real connection.
+    return getattr(self.connection, name)
+
+  def close(self):
+    """
+    Returns the connection to the pool if one was checked out. The object can
+    still be used afterwards, in which case a new connection is checked out.
+    """
+    if self._connection is not None:
+      self._connection.close()
+      self._connection = None
+
+def get_pool_stats():
+  """
+  Returns a dict describing the state of the connection pool, which is useful
+  for sizing the pool against the number of WSGI threads per process.
+  """
+  pool = get_engine().pool
+  stats = pool_stats.as_dict()
+  stats.update({
+    'pool_size': pool.size(),
+    'checked_in': pool.checkedin(),
+    'checked_out': pool.checkedout(),
+    'overflow': pool.overflow(),
+  })
+  return stats
@@ -1,6 +1,259 @@
+"""
+This module sends email. Once init_queue() has been called (ruddock.init()
+does this), send_email() only writes the message to a spool directory and
+hands it to a background thread, which delivers queued messages in batches
+over a single reused SMTP connection and retries failed deliveries with
+exponential backoff. Messages left in the spool by a process that died are
+picked up by the next process to start. Without a queue (for example in
+scripts), send_email() delivers the message immediately.
+"""
+
+import atexit
+import collections
+import heapq
+import json
+import logging
+import os
 import smtplib
+import threading
+import time
+import uuid
 from email.mime.text import MIMEText
 
+from ruddock import constants
+
+FROM_ADDRESS = 'auto@ruddock.caltech.edu'
+SMTP_HOST = 'localhost'
+
+logger = logging.getLogger("ruddock.email")
+
+# The process-wide delivery queue, set by init_queue().
+_queue = None
+
+def connect_smtp():
+  """Opens a new connection to the SMTP server."""
+  return smtplib.SMTP(SMTP_HOST)
+
+def disconnect_smtp(connection):
+  """Closes an SMTP connection, ignoring any errors."""
+  try:
+    connection.quit()
+  except Exception:
+    connection.close()
+
+class EmailQueue:
+  """
+  Delivers messages on a background thread. If spool_dir is not None, every
+  message is written there until it has been delivered (or has failed too
+  many times, in which case the spool file is renamed to end in .failed).
+  The thread is started when the first message is queued, so the queue can
+  safely be created before the server forks its workers.
+  """
+  def __init__(self, spool_dir=None, connect=None):
+    self.spool_dir = spool_dir
+    self.connect = connect
+    self.sent = 0
+    self.failed = 0
+    self.retried = 0
+    self._lock = threading.Condition()
+    # Messages ready to be delivered.
+    self._ready = collections.deque()
+    # Heap of (due time, sequence number, message) for messages waiting to be
+    # retried.
+    self._retries = []
+    self._retry_count = 0
+    # Number of messages queued but not yet delivered or given up on.
+    self._pending = 0
+    self._thread = None
+    self._connection = None
+
+  def _spool_path(self, item, suffix='.json'):
+    return os.path.join(self.spool_dir, item['id'] + suffix)
+
+  def _spool(self, item):
+    """Writes the message to the spool directory, replacing any old copy."""
+    if self.spool_dir is None:
+      return
+    path = self._spool_path(item)
+    with open(path + '.tmp', 'w') as spool_file:
+      json.dump(item, spool_file)
+    os.replace(path + '.tmp', path)
+
+  def _unspool(self, item, failed=False):
+    """Removes the message from the spool directory."""
+    if self.spool_dir is None:
+      return
+    path = self._spool_path(item)
+    try:
+      if failed:
+        os.replace(path, self._spool_path(item, '.failed'))
+      else:
+        os.remove(path)
+    except OSError:
+      logger.exception("Could not remove spooled email %s", path)
+
+  def _add(self, item):
+    with self._lock:
+      self._ready.append(item)
+      self._pending += 1
+      if self._thread is None or not self._thread.is_alive():
+        self._thread = threading.Thread(target=self._run,
+            name="email-delivery", daemon=True)
+        self._thread.start()
+      self._lock.notify_all()
+
+  def enqueue(self, to, message):
+    """Queues message (a string) for delivery to the address to."""
+    item = {
+      'id': uuid.uuid4().hex,
+      'to': to,
+      'message': message,
+      'attempts': 0,
+    }
+    self._spool(item)
+    self._add(item)
+
+  def recover(self, min_age):
+    """
+    Queues spooled messages that have not been touched for at least min_age
+    seconds, which were left behind by a process that stopped before
+    delivering them. Each file is claimed with an atomic rename, so processes
+    recovering at the same time never deliver the same message twice.
+    """
+    if self.spool_dir is None:
+      return 0
+    recovered = 0
+    now = time.time()
+    for name in os.listdir(self.spool_dir):
+      if not name.endswith('.json'):
+        continue
+      path = os.path.join(self.spool_dir, name)
+      try:
+        if now - os.path.getmtime(path) < min_age:
+          continue
+        claimed = os.path.join(self.spool_dir, uuid.uuid4().hex + '.claim')
+        os.rename(path, claimed)
+      except OSError:
+        # Someone else got to it first.
+        continue
+      with open(claimed) as spool_file:
+        item = json.load(spool_file)
+      item['id'] = os.path.basename(claimed)[:-len('.claim')]
+      self._spool(item)
+      os.remove(claimed)
+      self._add(item)
+      recovered += 1
+    return recovered
+
+  def flush(self, timeout=None):
+    """
+    Waits until every queued message has been delivered or given up on.
+    Returns False if the timeout expired first.
+    """
+    with self._lock:
+      return self._lock.wait_for(lambda: self._pending == 0, timeout)
+
+  def _next_batch(self):
+    """
+    Returns up to constants.EMAIL_BATCH_SIZE messages that are ready to be
+    delivered, or None if nothing became ready within
+    constants.EMAIL_IDLE_TIMEOUT seconds.
+    """
+    with self._lock:
+      while True:
+        now = time.monotonic()
+        while self._retries and self._retries[0][0] <= now:
+          self._ready.append(heapq.heappop(self._retries)[2])
+        if self._ready:
+          count = min(len(self._ready), constants.EMAIL_BATCH_SIZE)
+          return [self._ready.popleft() for _ in range(count)]
+        timeout = constants.EMAIL_IDLE_TIMEOUT
+        if self._retries:
+          timeout = min(timeout, self._retries[0][0] - now)
+        if not self._lock.wait(timeout) and not self._retries:
+          return None
+
+  def _deliver(self, item):
+    """Delivers a single message, reusing the open connection if possible."""
+    try:
+      if self._connection is None:
+        connect = self.connect if self.connect is not None else connect_smtp
+        self._connection = connect()
+      self._connection.sendmail(FROM_ADDRESS, [item['to']], item['message'])
+    except Exception:
+      logger.exception("Could not deliver email to %s", item['to'])
+      # The connection may be in a bad state, so start over with a new one.
+      self._disconnect()
+      self._retry(item)
+      return
+    self._unspool(item)
+    self._finish(sent=True)
+
+  def _retry(self, item):
+    item['attempts'] += 1
+    if item['attempts'] >= constants.EMAIL_MAX_ATTEMPTS:
+      logger.error("Giving up on email to %s after %d attempts",
+          item['to'], item['attempts'])
+      self._unspool(item, failed=True)
+      self._finish(sent=False)
+      return
+    # Record the attempt (this also keeps other processes from recovering it).
+    self._spool(item)
+    delay = constants.EMAIL_RETRY_DELAY * 2 ** (item['attempts'] - 1)
+    with self._lock:
+      self.retried += 1
+      self._retry_count += 1
+      heapq.heappush(self._retries,
+          (time.monotonic() + delay, self._retry_count, item))
+
+  def _finish(self, sent):
+    with self._lock:
+      if sent:
+        self.sent += 1
+      else:
+        self.failed += 1
+      self._pending -= 1
+      self._lock.notify_all()
+
+  def _disconnect(self):
+    if self._connection is not None:
+      disconnect_smtp(self._connection)
+      self._connection = None
+
+  def _run(self):
+    while True:
+      batch = self._next_batch()
+      if batch is None:
+        # Don't hold a connection open while there is nothing to send.
+        self._disconnect()
+        continue
+      for item in batch:
+        self._deliver(item)
+
+def init_queue(spool_dir):
+  """
+  Creates the delivery queue for this process, spooling to spool_dir, and
+  queues any messages abandoned in the spool. Without a spool, queued messages
+  would be lost whenever the server stops, so spool_dir is required.
+  """
+  global _queue
+  if spool_dir is None:
+    raise ValueError("The email queue needs a spool directory.")
+  os.makedirs(spool_dir, exist_ok=True)
+  if _queue is None:
+    atexit.register(_flush_at_exit)
+  _queue = EmailQueue(spool_dir)
+  _queue.recover(constants.EMAIL_SPOOL_RECOVERY_AGE)
+
+def _flush_at_exit():
+  # Anything still undelivered stays in the spool for the next process.
+  if _queue is not None:
+    _queue.flush(constants.EMAIL_EXIT_TIMEOUT)
+
+def get_queue():
+  """Returns the delivery queue, or None if there is none."""
+  return _queue
+
 def send_email(to, msg, subject, use_prefix=True):
   """
   Sends an email to a user. Expects 'to' to be a comma separated string of
@@ -12,9 +265,12 @@ def send_email(to, msg, subject, use_prefix=True):
     subject = '[RuddWeb] ' + subject
 
   msg['Subject'] = subject
-  msg['From'] = 'auto@ruddock.caltech.edu'
+  msg['From'] = FROM_ADDRESS
   msg['To'] = to
 
-  s = smtplib.SMTP('localhost')
-  s.sendmail('auto@ruddock.caltech.edu', [to], msg.as_string())
-  s.quit()
+  if _queue is not None:
+    _queue.enqueue(to, msg.as_string())
+    return
+  s = connect_smtp()
+  s.sendmail(FROM_ADDRESS, [to], msg.as_string())
+  disconnect_smtp(s)
@@ -10,10 +10,32 @@ class Environment(object):
     debug: bool for whether or not debug mode should be enabled.
     testing: bool for whether or not testing mode should be enabled.
     secret_key: secret key for session cookie.
+    media_folder: folder containing uploaded media.
+    db_pool_size: number of connections kept open in each worker's pool.
+    db_max_overflow: number of extra connections a worker may open when the
+      pool is exhausted.
+    db_pool_recycle: number of seconds after which a pooled connection is
+      replaced (this should be lower than MySQL's wait_timeout).
+    db_pool_pre_ping: bool for whether connections should be tested for
+      liveness before they are handed out.
+    slow_query_threshold: statements taking at least this many seconds are
+      written to the slow query log. None disables the log.
+    slow_query_log: file to write the slow query log to. If None, entries are
+      passed to the default logging handlers.
+    hash_pool_workers: number of threads in each worker's password hashing
+      pool.
+    hash_pool_queue: number of password hashing jobs that may wait for a free
+      thread before new ones are rejected.
+    email_spool_dir: directory where outgoing emails are kept until they have
+      been delivered. If None, the email_spool folder in the application's
+      instance folder is used.
   """
 
   def __init__(self, db_hostname, db_name, db_user, db_password, debug,
-      testing, secret_key, media_folder):
+      testing, secret_key, media_folder, db_pool_size=5, db_max_overflow=10,
+      db_pool_recycle=3600, db_pool_pre_ping=True, slow_query_threshold=0.5,
+      slow_query_log=None, hash_pool_workers=2, hash_pool_queue=8,
+      email_spool_dir=None):
     self.db_hostname = db_hostname
     self.db_name = db_name
     self.db_user = db_user
@@ -22,6 +44,15 @@ class Environment(object):
     self.testing = testing
     self.secret_key = secret_key
     self.media_folder = media_folder
+    self.db_pool_size = db_pool_size
+    self.db_max_overflow = db_max_overflow
+    self.db_pool_recycle = db_pool_recycle
+    self.db_pool_pre_ping = db_pool_pre_ping
+    self.slow_query_threshold = slow_query_threshold
+    self.slow_query_log = slow_query_log
+    self.hash_pool_workers = hash_pool_workers
+    self.hash_pool_queue = hash_pool_queue
+    self.email_spool_dir = email_spool_dir
 
   @property
   def db_uri(self):
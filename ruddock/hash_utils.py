@@ -0,0 +1,156 @@
+"""
+This module runs password hashing on a small pool of worker threads owned by
+the current process. Hashing a password takes constants.HASH_ROUNDS rounds of
+PBKDF2, so a burst of logins could otherwise occupy every request thread at
+once. The pool bounds how many hashes run concurrently and how many may wait
+for a worker; once both are used up, new jobs are rejected immediately with
+HashPoolFullError (which is served as a 503) rather than piling up.
+
+Worker threads are only started when the first job is submitted, so the pool
+can safely be created before the server forks its workers.
+"""
+
+import concurrent.futures
+import threading
+import time
+
+# The process-wide pool, set by init_pool().
+_pool = None
+
+class HashPoolFullError(Exception):
+  """Raised when the hashing pool cannot accept any more jobs."""
+  pass
+
+class HashStats:
+  """
+  Keeps track of how many hashing jobs ran, how long they waited for a worker,
+  how long the hashing itself took, and how many jobs were rejected. Instances
+  are safe to share between threads.
+  """
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.jobs = 0
+    self.rejected = 0
+    self.total_wait = 0.0
+    self.max_wait = 0.0
+    self.total_duration = 0.0
+    self.max_duration = 0.0
+
+  def record_job(self, wait, duration):
+    """Records a job that waited wait seconds and ran for duration seconds."""
+    with self._lock:
+      self.jobs += 1
+      self.total_wait += wait
+      self.max_wait = max(self.max_wait, wait)
+      self.total_duration += duration
+      self.max_duration = max(self.max_duration, duration)
+
+  def record_rejection(self):
+    """Records a job that was rejected because the pool was full."""
+    with self._lock:
+      self.rejected += 1
+
+  def reset(self):
+    """Clears all recorded statistics."""
+    with self._lock:
+      self.jobs = 0
+      self.rejected = 0
+      self.total_wait = 0.0
+      self.max_wait = 0.0
+      self.total_duration = 0.0
+      self.max_duration = 0.0
+
+  def as_dict(self):
+    """Returns the recorded statistics as a dict."""
+    with self._lock:
+      average_wait = self.total_wait / self.jobs if self.jobs else 0.0
+      average_duration = self.total_duration / self.jobs if self.jobs else 0.0
+      return {
+        'jobs': self.jobs,
+        'rejected': self.rejected,
+        'total_wait': self.total_wait,
+        'max_wait': self.max_wait,
+        'average_wait': average_wait,
+        'total_duration': self.total_duration,
+        'max_duration': self.max_duration,
+        'average_duration': average_duration,
+      }
+
+hash_stats = HashStats()
+
+class HashPool:
+  """
+  A bounded pool of hashing threads. At most workers jobs run at once and at
+  most max_queue more may wait for a free worker.
+  """
+  def __init__(self, workers, max_queue):
+    self.workers = workers
+    self.max_queue = max_queue
+    self.in_flight = 0
+    self._lock = threading.Lock()
+    self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+
+  def _release(self):
+    with self._lock:
+      self.in_flight -= 1
+
+  def run(self, func, *args):
+    """
+    Runs func(*args) on a worker thread and returns its result. Raises
+    HashPoolFullError without running anything if the pool is full.
+    """
+    with self._lock:
+      if self.in_flight >= self.workers + self.max_queue:
+        hash_stats.record_rejection()
+        raise HashPoolFullError
+      self.in_flight += 1
+
+    submitted = time.perf_counter()
+    def job():
+      started = time.perf_counter()
+      try:
+        return func(*args)
+      finally:
+        hash_stats.record_job(started - submitted,
+            time.perf_counter() - started)
+        self._release()
+
+    try:
+      future = self._executor.submit(job)
+    except Exception:
+      self._release()
+      raise
+    return future.result()
+
+  def shutdown(self):
+    """Waits for running jobs to finish and stops the worker threads."""
+    self._executor.shutdown(wait=True)
+
+def init_pool(environment):
+  """
+  Creates the hashing pool for this process using the settings of the
+  provided environment. Any previously created pool is shut down.
+  """
+  global _pool
+  if _pool is not None:
+    _pool.shutdown()
+  _pool = HashPool(environment.hash_pool_workers, environment.hash_pool_queue)
+  hash_stats.reset()
+
+def run(func, *args):
+  """
+  Runs func(*args) on the hashing pool and returns its result. If no pool has
+  been created (for example in scripts), func is simply called directly.
+  """
+  if _pool is None:
+    return func(*args)
+  return _pool.run(func, *args)
+
+def get_hash_stats():
+  """Returns statistics about the hashing pool as a dict."""
+  stats = hash_stats.as_dict()
+  if _pool is not None:
+    stats['workers'] = _pool.workers
+    stats['max_queue'] = _pool.max_queue
+    stats['in_flight'] = _pool.in_flight
+  return stats
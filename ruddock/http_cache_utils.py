@@ -0,0 +1,108 @@
+"""
+This module lets read-mostly pages answer conditional GET requests. A route
+decorated with conditional(version) declares a cheap version function, which
+returns a value (for example a row count and the latest updated_at) that
+changes whenever the page's data does. The page is sent with an ETag built
+from that value, and browsers must revalidate it on every visit; if the ETag
+they send back still matches, the response is a 304 Not Modified and the
+route itself (its queries and its template) never runs.
+
+Every page also depends on who is logged in (the header shows the username)
+and on the code that renders it, so both are part of the ETag as well.
+"""
+
+import functools
+import hashlib
+import os
+import flask
+import werkzeug.http
+
+def get_code_version():
+  """
+  Returns the latest modification time of the website's code and templates.
+  Every process running the same copy of the code gets the same value, and
+  deploying new code changes it (and with it, every ETag).
+  """
+  package_dir = os.path.dirname(os.path.abspath(__file__))
+  latest = 0
+  for root, dirs, files in os.walk(package_dir):
+    for filename in files:
+      if filename.endswith((".py", ".html")):
+        latest = max(latest, os.path.getmtime(os.path.join(root, filename)))
+  return latest
+
+CODE_VERSION = get_code_version()
+
+def is_cacheable():
+  """
+  Returns True if the response to the current request may be revalidated.
+  Pending messages are only shown once, so pages showing them can't be reused.
+  """
+  return (flask.request.method in ("GET", "HEAD")
+      and "_flashes" not in flask.session)
+
+def make_etag(version):
+  """Returns the ETag for a page with the given version for the current user."""
+  key = repr((CODE_VERSION,
+      flask.session.get("username"),
+      flask.session.get("show_admin"),
+      version))
+  return hashlib.md5(key.encode()).hexdigest()
+
+def set_cache_headers(response, etag, last_modified=None):
+  """Adds the headers asking browsers to revalidate the response."""
+  response.set_etag(etag)
+  if last_modified is not None:
+    response.last_modified = last_modified
+  response.cache_control.no_cache = True
+  if flask.session.get("username") is not None:
+    response.cache_control.private = True
+  response.vary.add("Cookie")
+  return response
+
+def conditional(version, last_modified=None):
+  """
+  Decorator for routes which answer conditional GET requests. version is
+  called with the route's arguments and returns a value identifying the
+  current content of the page (or None to always render it). last_modified,
+  if given, is called the same way and returns when the content last changed
+  as a UTC datetime. Place this below any login_required decorator, so that
+  permissions are checked first.
+  """
+  def decorator(route):
+    @functools.wraps(route)
+    def wrapped_route(*args, **kwargs):
+      if not is_cacheable():
+        return route(*args, **kwargs)
+      current_version = version(*args, **kwargs)
+      if current_version is None:
+        return route(*args, **kwargs)
+      etag = make_etag(current_version)
+      modified = None
+      if last_modified is not None:
+        modified = last_modified(*args, **kwargs)
+      if not werkzeug.http.is_resource_modified(flask.request.environ,
+          etag, last_modified=modified):
+        response = flask.Response(status=304)
+      else:
+        response = flask.make_response(route(*args, **kwargs))
+        if response.status_code != 200:
+          return response
+      return set_cache_headers(response, etag, modified)
+    return wrapped_route
+  return decorator
+
+def set_static_cache_headers(response):
+  """
+  Adjusts the caching headers of static files. The constitution PDFs are
+  replaced whenever it is amended (under the same URLs), so browsers must
+  revalidate them rather than keeping them for the usual maximum age.
+  """
+  if flask.request.endpoint != "static":
+    return response
+  filename = (flask.request.view_args or {}).get("filename", "")
+  if filename.startswith("constitution/"):
+    response.cache_control.max_age = None
+    response.cache_control.no_cache = True
+    response.cache_control.public = True
+  return response
@@ -1,54 +1,89 @@
+import datetime
 import flask
 import sqlalchemy
 
+from ruddock import cache_utils
+from ruddock import constants
 from ruddock import search_utils
 from ruddock.resources import MemberSearchMode
 
-def search_members_by_name(query, mode=None):
+# Holds the member name search index for this process.
+_member_index_cache = cache_utils.Cache(constants.MEMBER_INDEX_TTL)
+
+class MemberIndex:
+  """
+  In-memory search index over every member's name. Graduation years are kept
+  alongside so searches can be restricted to current members or alumni without
+  going back to the database.
+  """
+  def __init__(self, members):
+    """Builds the index from rows with user_id, name, and graduation_year."""
+    members = list(members)
+    self.names = {m['user_id']: m['name'] for m in members}
+    self.graduation_years = {
+        m['user_id']: m['graduation_year'] for m in members}
+    self.keyword_index = search_utils.KeywordIndex(
+        (m['user_id'], m['name']) for m in members)
+
+  def is_current(self, user_id, today=None):
+    """
+    Returns True if the member is current, False if they are an alumnus, or None
+    if their graduation year is unknown. Members graduate on July 1.
+    """
+    graduation_year = self.graduation_years.get(user_id)
+    if graduation_year is None:
+      return None
+    if today is None:
+      today = datetime.date.today()
+    return today < datetime.date(int(graduation_year), 7, 1)
+
+  def search(self, query, mode=None, limit=None, offset=0):
+    """
+    Returns the user IDs matching the query, best matches first and otherwise
+    ordered by name. See KeywordIndex.ranked_search for limit and offset.
+    """
+    predicate = None
+    if mode == "current":
+      today = datetime.date.today()
+      predicate = lambda x: self.is_current(x, today) is True
+    elif mode == "alumni":
+      today = datetime.date.today()
+      predicate = lambda x: self.is_current(x, today) is False
+    return self.keyword_index.ranked_search(query, limit=limit, offset=offset,
+        key=lambda x: (self.names[x].lower(), x),
+        predicate=predicate)
+
+def build_member_index():
+  """Loads every member's name and builds a new MemberIndex."""
+  query = sqlalchemy.text("""
+    SELECT user_id, name, graduation_year
+    FROM members NATURAL JOIN members_extra
+    """)
+  return MemberIndex(flask.g.db.execute(query))
+
+def get_member_index():
+  """Returns this process's MemberIndex, building it if necessary."""
+  return _member_index_cache.get_or_set("members", build_member_index)
+
+def invalidate_member_index():
+  """Discards the cached MemberIndex. Call this whenever members change."""
+  _member_index_cache.invalidate()
+
+def search_members_by_name(query, mode=None, limit=None, offset=0):
   """
   Searches members by name. Returns a list of user_id values that match the
   search query. By default, this searches all members. If mode is set to
   'current', then only current members are searched. If mode is set to
   'alumni', then only alumni are searched.
+
+  Results are ranked (names where the last word typed matches a whole word come
+  first) and then ordered by name. If limit is provided, at most limit results
+  are returned, starting after the first offset results.
   """
-  table = "members NATURAL JOIN members_extra"
-  if mode is None:
-    pass
-  elif mode == "current":
-    table += " NATURAL JOIN members_current"
-  elif mode == "alumni":
-    table += " NATURAL JOIN members_alumni"
-  else:
+  if mode not in (None, "current", "alumni"):
     # Invalid request.
     raise ValueError
 
-  # Don't name this 'query'!
-  db_query = sqlalchemy.text("""
-    SELECT user_id, name
-    FROM {}
-    ORDER BY name
-    """.format(table))
-  members = flask.g.db.execute(db_query)
-
-  # Results from the search
-  results = []
-
-  # Parse the query.
-  query_keywords = search_utils.parse_keywords(query)
-  # Nothing to search here.
-  if len(query_keywords) < 1:
-    return results
-
-  # The last keyword is special, since it can be a partial match (this handles
-  # the case where the user is still typing).
-  last_keyword = query.lower().split()[-1]
-
   # We want names that match every keyword in the query, allowing partial
   # matches on the last word.
-  for member in members:
-    member_keywords = search_utils.parse_keywords(member['name'])
-    matches = search_utils.count_matches(member_keywords,
-        query_keywords, [last_keyword])
-    if matches >= len(query_keywords):
-      results.append(member['user_id'])
-  return results
+  return get_member_index().search(query, mode, limit, offset)
@@ -1,10 +1,72 @@
+import csv
+import io
+import os
 import flask
 import sqlalchemy
 
 from ruddock import auth_utils
+from ruddock import constants
 from ruddock import email_templates
 from ruddock import email_utils
+from ruddock import member_utils
 from ruddock import validation_utils
+from ruddock.cache_utils import reference_data
+
+# Results of importing a single member.
+ADDED = 'added'
+UPDATED = 'updated'
+DUPLICATE = 'duplicate'
+
+# Columns of the CSV template, in order.
+CSV_FIELDS = ['first_name', 'last_name', 'matriculation_year',
+    'graduation_year', 'uid', 'email', 'membership_desc']
+
+def load_template_header():
+  """
+  Returns the columns of the CSV template's first line, so that the header
+  can be skipped if encountered. Returns None if the template can't be read.
+  """
+  template_filename = os.path.join(os.path.dirname(__file__),
+      '..', '..', 'static', 'admin', 'add_members_template.csv')
+  try:
+    with open(template_filename, newline='') as template_file:
+      return [s.strip() for s in next(csv.reader(template_file))]
+  except (IOError, StopIteration):
+    # Something weird happened, but this shouldn't be fatal.
+    return None
+
+# The template never changes, so only read it once.
+TEMPLATE_HEADER = load_template_header()
+
+@reference_data("membership_types")
+def get_membership_types():
+  """
+  Returns a dict mapping every membership description, both long and short
+  and in lowercase, to a (member_type, membership_desc_short) tuple. The dict
+  is cached, so it must not be modified.
+  """
+  query = sqlalchemy.text("""
+    SELECT member_type, membership_desc, membership_desc_short
+    FROM membership_types
+    """)
+  membership_types = {}
+  for row in flask.g.db.execute(query):
+    value = (row['member_type'], row['membership_desc_short'])
+    membership_types[row['membership_desc'].lower()] = value
+    membership_types[row['membership_desc_short'].lower()] = value
+  return membership_types
+
+def get_existing_uids(uids):
+  """Returns the set of the provided UIDs which belong to existing members."""
+  if len(uids) == 0:
+    return set()
+  query = sqlalchemy.text("""
+    SELECT uid
+    FROM members
+    WHERE uid IN :uids
+    """).bindparams(sqlalchemy.bindparam('uids', expanding=True))
+  result = flask.g.db.execute(query, uids=list(uids))
+  return set(row['uid'] for row in result)
 
 class NewMember:
   """Class containing data for adding a single new member."""
@@ -18,9 +80,8 @@ class NewMember:
     self.uid = uid
     self.email = email
     self.membership_desc = membership_desc
-    # Membership type is set from the membership desc.
+    # Membership type is set from the membership desc by set_member_type().
     self.member_type = None
-    self.set_member_type()
 
   def __str__(self):
     """Converts to a CSV string."""
@@ -52,62 +113,40 @@ class NewMember:
       is_valid = False
     return is_valid
 
-  def add_member(self):
+  def get_insert_params(self):
     """
-    Adds this member to the database. Assumes data has already been validated.
-    Returns True if successful, otherwise False.
+    Returns the parameters for inserting this member, including a newly
+    generated account creation key.
     """
-    # If the user is already in the database, skip this user.
-    if validation_utils.check_uid_exists(self.uid):
-      query = sqlalchemy.text("""
-      UPDATE members
-      SET member_type = :m
-      WHERE uid = :uid
-      """)
-      flask.g.db.execute(query, m=self.member_type, uid=self.uid)
-      return False
-    # Generate an account creation key.
-    create_account_key = auth_utils.generate_create_account_key()
-    query = sqlalchemy.text("""
-      INSERT INTO members (first_name, last_name, matriculation_year, graduation_year,
-        uid, email, member_type, create_account_key)
-      VALUES (:first_name, :last_name, :matriculation_year, :graduation_year,
-        :uid, :email, :member_type, :create_account_key)
-      """)
-    flask.g.db.execute(query, first_name=self.first_name,
-        last_name=self.last_name,
-        matriculation_year=self.matriculation_year,
-        graduation_year=self.graduation_year,
-        uid=self.uid,
-        email=self.email,
-        member_type=self.member_type,
-        create_account_key=create_account_key)
-    # Email the user.
+    return {
+      'first_name': self.first_name,
+      'last_name': self.last_name,
+      'matriculation_year': self.matriculation_year,
+      'graduation_year': self.graduation_year,
+      'uid': self.uid,
+      'email': self.email,
+      'member_type': self.member_type,
+      'create_account_key': auth_utils.generate_create_account_key(),
+    }
+
+  def send_welcome_email(self, create_account_key):
+    """Queues an email inviting this member to create an account."""
     subject = "Welcome to the Ruddock House website!"
     msg = email_templates.AddedToWebsiteEmail.format(self.name,
         flask.url_for('account.create_account',
           create_account_key=create_account_key,
           _external=True))
-    to = self.email
-    email_utils.send_email(to, msg, subject)
-    return True
+    email_utils.send_email(self.email, msg, subject)
 
-  def set_member_type(self):
+  def set_member_type(self, membership_types):
     """
-    Takes a membership description (full, social, RA, etc) and sets the
-    member_type and membership_desc attributes. If not successful, sets
-    member_type to None.
+    Takes a dict from get_membership_types() and uses the membership
+    description (full, social, RA, etc) to set the member_type and
+    membership_desc attributes. If not successful, sets member_type to None.
     """
-    query = sqlalchemy.text("""
-      SELECT member_type, membership_desc_short
-      FROM membership_types
-      WHERE membership_desc = :d
-        OR membership_desc_short = :d
-      """)
-    result = flask.g.db.execute(query, d=self.membership_desc).first()
+    result = membership_types.get(self.membership_desc.lower())
     if result is not None:
-      self.member_type = result['member_type']
-      self.membership_desc = result['membership_desc_short']
+      self.member_type, self.membership_desc = result
     else:
       self.member_type = None
       # Don't set self.membership_desc, so we can print what the error was later.
@@ -125,11 +164,18 @@ class NewMemberList:
     """Returns data formatted as a CSV string."""
     return '\n'.join(str(new_member) for new_member in self.new_member_list)
 
+  def set_member_types(self):
+    """Sets the membership type of every member, using a single query."""
+    membership_types = get_membership_types()
+    for new_member in self.new_member_list:
+      new_member.set_member_type(membership_types)
+
   def validate_data(self, flash_errors=True):
     """
     Returns True if all data is valid. Otherwise, flashes error message(s) if
     requested and returns False.
     """
+    self.set_member_types()
     # Check every set of new member data, don't stop at the first error.
     is_valid = True
     for new_member in self.new_member_list:
@@ -138,15 +184,70 @@ class NewMemberList:
     return is_valid
 
   def add_members(self):
-    """Adds all members to the database. Assumes data to be valid."""
-    # Keep track of which members were added and which were skipped.
-    members_added = []
-    members_skipped = []
+    """
+    Adds all members to the database in a single transaction, using a constant
+    number of queries. Members who are already in the database have their
+    membership type updated instead. Assumes data to be valid (and so member
+    types to be set).
+
+    Returns a list of (new_member, result) tuples in the original order, where
+    result is one of ADDED, UPDATED (already a member), or DUPLICATE (listed
+    earlier in the same import). Returns None if the database could not be
+    updated, in which case nothing was changed.
+    """
+    existing_uids = get_existing_uids(
+        set(new_member.uid for new_member in self.new_member_list))
+    results = []
+    insert_params = []
+    # Maps each member type to the existing UIDs being set to it.
+    updated_uids = {}
+    seen_uids = set()
     for new_member in self.new_member_list:
-      if new_member.add_member():
-        members_added.append(new_member.name)
+      if new_member.uid in seen_uids:
+        results.append((new_member, DUPLICATE))
+        continue
+      seen_uids.add(new_member.uid)
+      if new_member.uid in existing_uids:
+        updated_uids.setdefault(new_member.member_type, []).append(
+            new_member.uid)
+        results.append((new_member, UPDATED))
       else:
-        members_skipped.append(new_member.name)
+        insert_params.append(new_member.get_insert_params())
+        results.append((new_member, ADDED))
+
+    insert_query = sqlalchemy.text("""
+      INSERT INTO members (first_name, last_name, matriculation_year, graduation_year,
+        uid, email, member_type, create_account_key)
+      VALUES (:first_name, :last_name, :matriculation_year, :graduation_year,
+        :uid, :email, :member_type, :create_account_key)
+      """)
+    update_query = sqlalchemy.text("""
+      UPDATE members
+      SET member_type = :m
+      WHERE uid IN :uids
+      """).bindparams(sqlalchemy.bindparam('uids', expanding=True))
+    transaction = flask.g.db.begin()
+    try:
+      # One statement per membership type, not per member.
+      for member_type, uids in updated_uids.items():
+        flask.g.db.execute(update_query, m=member_type, uids=uids)
+      if len(insert_params) > 0:
+        flask.g.db.execute(insert_query, insert_params)
+      transaction.commit()
+    except Exception:
+      transaction.rollback()
+      flask.flash("The members could not be added. No changes were made.")
+      return None
+    if len(insert_params) > 0:
+      member_utils.invalidate_member_index()
+
+    # Emails are only queued here; they are delivered in the background.
+    added = [new_member for new_member, result in results if result == ADDED]
+    for new_member, params in zip(added, insert_params):
+      new_member.send_welcome_email(params['create_account_key'])
+    members_added = [new_member.name for new_member in added]
+    members_skipped = [new_member.name for new_member, result in results
+        if result != ADDED]
     flask.flash("{0} member(s) were successfully added and {1} member(s) were skipped.".format(len(members_added), len(members_skipped)))
     # Email admins about added members.
 
@@ -158,70 +259,70 @@ class NewMemberList:
     # Don't use prefix since this is being sent to IMSS/Secretary, which have
     # their own prefixes.
     email_utils.send_email(to, msg, subject, use_prefix=False)
+    return results
 
-  def parse_csv_file(self, filename):
+  def parse_csv_file(self, csv_file):
     """
-    Parses a CSV file located at filename. Returns True if successful.
-    This function does NOT validate the data.
-
-    A good way to use this for user submitted data would be to save the data in
-    a tempfile and then pass the tempfile's name here.
+    Parses an uploaded CSV file, given as a binary file object. The file is
+    read incrementally, so it is never held in memory all at once. Returns
+    True if successful. This function does NOT validate the data.
     """
+    # Before Python 3.11, SpooledTemporaryFile (which holds large uploads)
+    # lacks the methods TextIOWrapper needs, but the file it wraps has them.
+    if not hasattr(csv_file, 'readable'):
+      csv_file = csv_file._file
+    # Excel saves UTF-8 files with a byte order mark, which utf-8-sig skips.
+    # newline='' leaves line endings to csv, so quoted fields can span lines.
+    stream = io.TextIOWrapper(csv_file, encoding='utf-8-sig', newline='')
     try:
-      # Use universal newlines so all newlines are \n regardless of if the file
-      # was originally made on a Unix or Windows system.
-      f = open(filename, 'rU')
-      contents = f.read()
-      f.close()
-    except IOError:
-      flask.flash("An unexpected error occurred when trying to open the file.")
+      return self.parse_csv_stream(stream)
+    except UnicodeDecodeError:
+      flask.flash("File does not seem to be a CSV file.")
       return False
-    return self.parse_csv_string(contents)
+    finally:
+      # Don't close the uploaded file along with the wrapper.
+      stream.detach()
 
   def parse_csv_string(self, csv_string):
     """
     Parses a CSV string. Returns True if successful.
     This function does NOT validate the data.
-
-    Expects newlines to be the standard Unix \n. Use universal newlines support
-    if reading from a file.
     """
-    # Get the template file's first line so we can skip it if encountered.
-    template_filename = 'ruddock/static/admin/add_members_template.csv'
-    try:
-      template_file = open(template_filename, 'rU')
-      template_header = template_file.readlines()[0].strip()
-      template_file.close()
-    except IOError as IndexError:
-      # Something weird happened, but this shouldn't be fatal.
-      template_header = ''
+    return self.parse_csv_stream(io.StringIO(csv_string, newline=''))
 
+  def parse_csv_stream(self, stream):
+    """
+    Parses CSV data from a text stream, one row at a time. Returns True if
+    successful. Stops at the first row that does not have enough columns, or
+    once there are more than constants.MAX_NEW_MEMBERS rows.
+    This function does NOT validate the data.
+    """
     # List of NewMember objects parsed.
     new_member_list = []
-    for line in csv_string.split('\n'):
-      # If this is the template's header, then we can safely skip it.
-      # Also skip if the line is empty (newlines at the end, most likely).
-      if line == template_header or line == '':
-        continue
-      # Split each line by commas, and then strip leading/trailing whitespace.
-      data = [s.strip() for s in line.split(',')]
-      try:
-        first_name = data[0]
-        last_name = data[1]
-        matriculation_year = data[2]
-        graduation_year = data[3]
-        uid = data[4]
-        email = data[5]
-        membership_desc = data[6]
-        # Ignore any additional columns. This is possible if Excel (or other
-        # program) thought more columns were used than were actually touched,
-        # and inserts extra commas at the end of the line.
-      except IndexError:
-        # Not enough columns.
-        flask.flash("File does not seem to be in the same format as the template.")
-        return False
-      new_member = NewMember(first_name, last_name, matriculation_year, graduation_year, \
-          uid, email, membership_desc)
-      new_member_list.append(new_member)
+    # Any additional columns are collected under restkey and ignored. This is
+    # possible if Excel (or other program) thought more columns were used than
+    # were actually touched, and inserts extra commas at the end of the line.
+    # Missing columns are filled in with None.
+    reader = csv.DictReader(stream, fieldnames=CSV_FIELDS, restkey='extra')
+    try:
+      for row in reader:
+        # Strip leading/trailing whitespace.
+        values = [row[field] and row[field].strip() for field in CSV_FIELDS]
+        # If this is the template's header, then we can safely skip it.
+        # Also skip if the line is empty (newlines at the end, most likely).
+        if values == TEMPLATE_HEADER or not any(values):
+          continue
+        if None in values:
+          # Not enough columns.
+          flask.flash("File does not seem to be in the same format as the template.")
+          return False
+        if len(new_member_list) >= constants.MAX_NEW_MEMBERS:
+          flask.flash("At most {0} members can be added at once.".format(
+            constants.MAX_NEW_MEMBERS))
+          return False
+        new_member_list.append(NewMember(*values))
+    except csv.Error:
+      flask.flash("File does not seem to be in the same format as the template.")
+      return False
     self.new_member_list = new_member_list
     return True
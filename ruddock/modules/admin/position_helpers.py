@@ -1,7 +1,9 @@
 import flask
 import sqlalchemy
 
+from ruddock import auth_utils
 from ruddock import validation_utils
+from ruddock.modules.government import helpers as government_helpers
 
 def handle_new_assignment(office_id, user_id, start_date, end_date):
   """
@@ -36,6 +38,8 @@ def handle_new_assignment(office_id, user_id, start_date, end_date):
   try:
     flask.g.db.execute(query, oid=office_id, uid=user_id,
         start=start_date, end=end_date)
+    auth_utils.invalidate_permissions(user_id)
+    government_helpers.invalidate_offices_page()
     return True
   except Exception:
     flask.flash("Encountered unexpected error. Try again?")
@@ -61,6 +65,8 @@ def handle_edit_assignment(assignment_id, start_date, end_date):
     """)
   try:
     flask.g.db.execute(query, start=start_date, end=end_date, a=assignment_id)
+    auth_utils.invalidate_permissions()
+    government_helpers.invalidate_offices_page()
     return True
   except Exception:
     return False
@@ -75,6 +81,8 @@ def handle_delete_assignment(assignment_id):
     """)
   try:
     flask.g.db.execute(query, a=assignment_id)
+    auth_utils.invalidate_permissions()
+    government_helpers.invalidate_offices_page()
     return True
   except Exception:
     return False
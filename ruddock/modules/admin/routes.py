@@ -1,9 +1,11 @@
-import tempfile
 import http.client
 import flask
 import json
 
 from ruddock import auth_utils
+from ruddock import constants
+from ruddock import db_utils
+from ruddock import hash_utils
 from ruddock import office_utils
 from ruddock import member_utils
 from ruddock.resources import Permissions
@@ -61,13 +63,9 @@ def add_members_multi_confirm():
   if new_members_file is None:
     flask.flash("You must upload a file!")
     return flask.redirect(flask.url_for('admin.add_members'))
-  # Save the file to a tempfile so we can parse it.
-  f = tempfile.NamedTemporaryFile()
-  f.write(new_members_file.read())
-  f.flush()
   # Parse and validate the data.
   new_member_list = member_helpers.NewMemberList()
-  if new_member_list.parse_csv_file(f.name):
+  if new_member_list.parse_csv_file(new_members_file.stream):
     if new_member_list.validate_data():
       return flask.render_template('add_members_confirm.html',
           new_member_list=new_member_list,
@@ -85,8 +83,11 @@ def add_members_confirm_submit():
   new_member_list = member_helpers.NewMemberList()
   if new_member_list.parse_csv_string(new_member_data):
     if new_member_list.validate_data(flash_errors=False):
-      new_member_list.add_members()
-      return flask.redirect(flask.url_for('admin.add_members'))
+      results = new_member_list.add_members()
+      if results is None:
+        return flask.redirect(flask.url_for('admin.add_members'))
+      return flask.render_template('add_members_results.html',
+          results=results)
   # An error happened somewhere.
   flask.flash("An unexpected error was encountered. Please find an IMSS rep.")
   return flask.redirect(flask.url_for('admin.add_members'))
@@ -191,7 +192,28 @@ def ajax_get_members():
 @blueprint.route('/ajax/positions/members/search')
 @login_required(Permissions.USERS)
 def ajax_search_members():
-  """Returns a list of user IDs for members who match the search query."""
+  """
+  Returns a list of user IDs for members who match the search query, best
+  matches first. Accepts optional limit and offset arguments for paging.
+  """
   query = flask.request.args.get('query', '')
-  results = member_utils.search_members_by_name(query)
+  limit = flask.request.args.get('limit', constants.MEMBER_SEARCH_LIMIT,
+      type=int)
+  offset = flask.request.args.get('offset', 0, type=int)
+  limit = max(0, min(limit, constants.MAX_MEMBER_SEARCH_LIMIT))
+  offset = max(0, offset)
+  results = member_utils.search_members_by_name(query, limit=limit,
+      offset=offset)
   return json.dumps(results)
+
+@blueprint.route('/ajax/pool_stats')
+@login_required(Permissions.ADMIN)
+def ajax_get_pool_stats():
+  """Returns statistics about this process's database connection pool."""
+  return json.dumps(db_utils.get_pool_stats())
+
+@blueprint.route('/ajax/hash_stats')
+@login_required(Permissions.ADMIN)
+def ajax_get_hash_stats():
+  """Returns statistics about this process's password hashing pool."""
+  return json.dumps(hash_utils.get_hash_stats())
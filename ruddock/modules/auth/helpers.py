@@ -5,13 +5,24 @@ from ruddock import auth_utils
 from ruddock import constants
 from ruddock import email_templates
 from ruddock import email_utils
+from ruddock import throttle_utils
 from ruddock import validation_utils
 
+# Limit how often logins may be attempted, to bound the hashing work any one
+# account or client can cause.
+username_throttle = throttle_utils.Throttle(
+    constants.LOGIN_USERNAME_BURST, constants.LOGIN_USERNAME_RATE)
+ip_throttle = throttle_utils.Throttle(
+    constants.LOGIN_IP_BURST, constants.LOGIN_IP_RATE)
+
 def authenticate(username, password):
   """
   Takes a username and password and checks if this corresponds to an actual
   user. Returns user_id if successful, else None. If a legacy algorithm is
   used, then the password is rehashed using the current algorithm.
+
+  Raises throttle_utils.ThrottledError if there have been too many recent
+  attempts for this username or from this IP address.
   """
 
   # Make sure the password is not too long (hashing extremely long passwords
@@ -27,6 +38,19 @@ def authenticate(username, password):
     WHERE username=:u
     """)
   result = flask.g.db.execute(query, u=username).first()
+
+  # Repeating an attempt that just failed fails again, without hashing.
+  if result is not None:
+    attempt_key = auth_utils.get_login_attempt_key(username, password,
+        result['password_hash'])
+    if auth_utils.failed_login_cache.get(attempt_key, False):
+      return None
+  # Throttle attempts before doing any expensive work.
+  if not ip_throttle.allow(flask.request.remote_addr):
+    raise throttle_utils.ThrottledError
+  if not username_throttle.allow(username):
+    raise throttle_utils.ThrottledError
+
   if result is None:
     # Invalid username.
     return None
@@ -43,6 +67,7 @@ def authenticate(username, password):
         auth_utils.set_password(username, password)
       # User is authenticated.
       return user_id
+  auth_utils.failed_login_cache.set(attempt_key, True)
   return None
 
 def handle_forgotten_password(username, email):
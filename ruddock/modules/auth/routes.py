@@ -1,6 +1,7 @@
 import flask
 
 from ruddock import auth_utils
+from ruddock import throttle_utils
 from ruddock.modules.auth import blueprint, helpers
 
 @blueprint.route('/login')
@@ -15,11 +16,18 @@ def login_submit():
   password = flask.request.form.get('password', None)
 
   if username is not None and password is not None:
-    user_id = helpers.authenticate(username, password)
+    try:
+      user_id = helpers.authenticate(username, password)
+    except throttle_utils.ThrottledError:
+      flask.flash('Too many login attempts. Please wait a minute and try again.')
+      return flask.redirect(flask.url_for('auth.login'))
     if user_id is not None:
-      permissions = auth_utils.get_permissions(username)
       flask.session['username'] = username
-      flask.session['permissions'] = permissions
+      flask.session['user_id'] = user_id
+      # Permissions are looked up from the server-side cache on each request,
+      # so drop any list left over from an older session.
+      flask.session.pop('permissions', None)
+      flask.g.pop('permissions', None)
       # True if there's any reason to show a link to the admin interface.
       flask.session['show_admin'] = len(auth_utils.generate_admin_links()) > 0
       # Update last login time
@@ -82,4 +90,5 @@ def reset_password_submit(reset_key):
 @blueprint.route('/logout')
 def logout():
   flask.session.pop('username', None)
+  flask.session.pop('user_id', None)
   return flask.redirect(flask.url_for('home'))
@@ -1,6 +1,21 @@
+import datetime
 import flask
 import sqlalchemy
 
+def get_birthdays_version():
+  """
+  Returns a value which changes whenever the list of birthdays does, for
+  http_cache_utils.conditional. Upcoming birthdays and ages depend on the
+  date, so it is included too.
+  """
+  query = sqlalchemy.text("""
+    SELECT
+      (SELECT COUNT(*) FROM members) AS members,
+      (SELECT MAX(member_updated_at) FROM members) AS member_updated_at
+    """)
+  result = flask.g.db.execute(query).first()
+  return tuple(result) + (datetime.date.today(),)
+
 def fetch_birthdays():
   """Returns the birthdays of all current students."""
   query = sqlalchemy.text("""
@@ -3,12 +3,14 @@ import flask
 
 import datetime
 
+from ruddock import http_cache_utils
 from ruddock.resources import Permissions
 from ruddock.decorators import login_required
 from ruddock.modules.birthdays import blueprint, helpers
 
 @blueprint.route('/')
 @login_required(Permissions.BIRTHDAYS)
+@http_cache_utils.conditional(helpers.get_birthdays_version)
 def show_bdays():
   """Displays a list of birthdays for current students."""
 
@@ -1,10 +1,17 @@
 import csv
+import datetime
 import flask
 import io
 import sqlalchemy
 from enum import Enum
 
 import ruddock.validation_utils as vu
+from ruddock.cache_utils import reference_data, request_memoized
+
+# Approximate number of characters sent at a time when streaming CSV exports.
+EXPORT_CHUNK_SIZE = 64 * 1024
+# Number of rows shown per page of the expense and payment lists.
+LEDGER_PAGE_SIZE = 100
 
 class PaymentType(Enum):
   CASH = 1
@@ -61,14 +68,11 @@ def get_current_fyear():
   If no matching row is found, returns None.
   """
 
-  query = sqlalchemy.text("""
-    SELECT fyear_id, fyear_num
-    FROM budget_fyears
-    WHERE CURDATE() BETWEEN start_date AND end_date
-  """)
-  rp = flask.g.db.execute(query)
-
-  return rp.first()
+  today = datetime.date.today()
+  for fyear in get_fyears():
+    if fyear["start_date"] <= today <= fyear["end_date"]:
+      return fyear
+  return None
 
 
 def get_expenses():
@@ -85,6 +89,7 @@ def get_expenses():
 
   return flask.g.db.execute(query).fetchall()
 
+@request_memoized
 def get_expense(expense_id):
   """Gets a particular expense, or None"""
   query = sqlalchemy.text("""
@@ -99,6 +104,7 @@ def get_expense(expense_id):
 
   return flask.g.db.execute(query, e=expense_id).first()
 
+@request_memoized
 def get_payment(payment_id):
   """Gets a particular payment, or None"""
   query = sqlalchemy.text("""
@@ -112,41 +118,167 @@ def get_payment(payment_id):
 
   return flask.g.db.execute(query, e=payment_id).first()
 
-def get_payments():
-  """Gets list of all payments."""
-  query = sqlalchemy.text("""
+
+# Filters for the expense and payment lists. Maps each filter's request
+# argument to its validation function. Values that don't validate are ignored.
+LEDGER_FILTERS = {
+  "fyear": vu.validate_integer,
+  "budget": vu.validate_integer,
+  "payee": vu.validate_integer,
+  "account": vu.validate_integer,
+  "start": vu.validate_date,
+  "end": vu.validate_date,
+}
+
+# SQL conditions for each filter, for the expense and payment lists. The
+# payment list can't be filtered by fiscal year or budget.
+EXPENSE_FILTER_CONDITIONS = {
+  "fyear": "budget_budgets.fyear_id = :fyear",
+  "budget": "budget_expenses.budget_id = :budget",
+  "payee": "budget_expenses.payee_id = :payee",
+  "account": "budget_payments.account_id = :account",
+  "start": "budget_expenses.date_incurred >= :start",
+  "end": "budget_expenses.date_incurred <= :end",
+}
+PAYMENT_FILTER_CONDITIONS = {
+  "payee": "budget_payments.payee_id = :payee",
+  "account": "budget_payments.account_id = :account",
+  "start": "budget_payments.date_written >= :start",
+  "end": "budget_payments.date_written <= :end",
+}
+
+
+def get_ledger_filters(args):
+  """
+  Returns a dict with the valid filters present in args (usually the request
+  arguments), for use with get_expenses_page and get_payments_page.
+  """
+  filters = {}
+  for name, validate in LEDGER_FILTERS.items():
+    value = args.get(name, "")
+    if value != "" and validate(value, flash_errors=False):
+      filters[name] = value
+  return filters
+
+
+def get_page_key(args, name):
+  """Returns the named pagination argument from args as an integer, or None."""
+  value = args.get(name, "")
+  if not vu.validate_integer(value, flash_errors=False):
+    return None
+  return int(value)
+
+
+def get_keyset_page(select, id_column, conditions, filters, before, after,
+    page_size):
+  """
+  Returns one page of rows ordered by id_column, newest first, as a tuple
+  (rows, has_older, has_newer). The page is found by seeking on the ID
+  (keyset pagination) rather than with an OFFSET, so every page costs the
+  same regardless of how far back it is:
+
+    before: only rows with IDs less than this (the next page back).
+    after: only rows with IDs greater than this (the previous page).
+
+  select is a SELECT ... FROM ... clause, and conditions maps the names of
+  the filters which can be applied to it to their SQL conditions.
+  """
+  where = [conditions[name] for name in filters if name in conditions]
+  params = {name: filters[name] for name in filters if name in conditions}
+
+  def run_query(seek, order, limit, **seek_params):
+    query = sqlalchemy.text("""
+      {0}
+      WHERE {1}
+      ORDER BY {2} {3}
+      LIMIT :limit
+      """.format(select, " AND ".join(where + [seek]), id_column, order))
+    return flask.g.db.execute(query, limit=limit, **dict(params,
+        **seek_params)).fetchall()
+
+  # Fetch one extra row to find out whether there is another page in the
+  # direction being paged.
+  if after is not None:
+    rows = run_query("{0} > :after".format(id_column), "ASC", page_size + 1,
+        after=after)
+    has_newer = len(rows) > page_size
+    rows = rows[:page_size]
+    rows.reverse()
+  else:
+    seek, seek_params = "TRUE", {}
+    if before is not None:
+      seek, seek_params = "{0} < :before".format(id_column), {"before": before}
+    rows = run_query(seek, "DESC", page_size + 1, **seek_params)
+    has_older = len(rows) > page_size
+    rows = rows[:page_size]
+
+  # Check whether there are any rows beyond the page in the other direction.
+  # Without a key, the page starts at the newest row.
+  if after is not None:
+    edge = rows[-1][id_column] if len(rows) > 0 else after + 1
+    has_older = len(run_query("{0} < :edge".format(id_column), "DESC", 1,
+        edge=edge)) > 0
+  elif before is not None:
+    edge = rows[0][id_column] if len(rows) > 0 else before - 1
+    has_newer = len(run_query("{0} > :edge".format(id_column), "ASC", 1,
+        edge=edge)) > 0
+  else:
+    has_newer = False
+  return rows, has_older, has_newer
+
+
+def get_expenses_page(filters, before=None, after=None, page_size=None):
+  """
+  Gets one page of the expense list, filtered by the filters from
+  get_ledger_filters. See get_keyset_page.
+  """
+  select = """
+    SELECT expense_id, budget_name, fyear_num, date_incurred, description,
+      cost, payment_id, payee_name, payment_type, account_name, check_no
+    FROM budget_expenses LEFT JOIN budget_payments USING(payment_id)
+      NATURAL JOIN budget_budgets
+      NATURAL JOIN budget_fyears
+      NATURAL LEFT JOIN budget_accounts
+      LEFT JOIN budget_payees ON budget_expenses.payee_id = budget_payees.payee_id
+    """
+  return get_keyset_page(select, "expense_id", EXPENSE_FILTER_CONDITIONS,
+      filters, before, after, page_size or LEDGER_PAGE_SIZE)
+
+
+def get_payments_page(filters, before=None, after=None, page_size=None):
+  """
+  Gets one page of the payment list, filtered by the filters from
+  get_ledger_filters. See get_keyset_page.
+  """
+  select = """
     SELECT payment_id, account_name, payment_type, amount, date_written,
         date_posted, payee_name, check_no
     FROM budget_payments
       NATURAL JOIN budget_accounts
       NATURAL LEFT JOIN budget_payees
-    ORDER BY payment_id DESC
-    """)
-
-  return flask.g.db.execute(query).fetchall()
+    """
+  return get_keyset_page(select, "payment_id", PAYMENT_FILTER_CONDITIONS,
+      filters, before, after, page_size or LEDGER_PAGE_SIZE)
 
 
-def get_transactions():
-  """Gets list of all expenses + payments."""
-  # We need the USING clause because there's a payee_id in both tables
-  # TODO change the column in one of the tables to a different name
+@reference_data("budget_budgets", "budget_fyears")
+def get_all_budgets():
+  """Gets list of all budgets in every year, newest years first."""
   query = sqlalchemy.text("""
-    SELECT *
-    FROM budget_expenses LEFT JOIN budget_payments USING(payment_id)
-      NATURAL JOIN budget_budgets
+    SELECT budget_id, budget_name, fyear_num
+    FROM budget_budgets
       NATURAL JOIN budget_fyears
-      NATURAL LEFT JOIN budget_accounts
-      LEFT JOIN budget_payees ON budget_expenses.payee_id = budget_payees.payee_id
-    ORDER BY expense_id DESC
+    ORDER BY fyear_num DESC, budget_name
     """)
 
   return flask.g.db.execute(query).fetchall()
 
 
+@reference_data("budget_fyears")
 def get_fyears():
   """Gets list of all available fiscal years."""
   query = sqlalchemy.text("""
-    SELECT fyear_id, fyear_num
+    SELECT fyear_id, fyear_num, start_date, end_date
     FROM budget_fyears
     ORDER BY fyear_id DESC
     """)
@@ -154,6 +286,7 @@ def get_fyears():
   return flask.g.db.execute(query).fetchall()
 
 
+@reference_data("budget_budgets", "budget_fyears")
 def get_budget_list(fyear_id):
   """Gets list of all budgets in the given year."""
   query = sqlalchemy.text("""
@@ -167,6 +300,7 @@ def get_budget_list(fyear_id):
   return flask.g.db.execute(query, f=fyear_id).fetchall()
 
 
+@reference_data("budget_accounts")
 def get_accounts():
   """Gets list of all accounts."""
   query = sqlalchemy.text("""
@@ -189,39 +323,48 @@ def get_payees():
   return flask.g.db.execute(query).fetchall()
 
 
+def get_summary_version():
+  """
+  Returns a value which changes whenever the account and budget summaries do,
+  for http_cache_utils.conditional. The stored totals are columns of the
+  accounts and budgets, so every change to them updates their rows.
+  """
+  query = sqlalchemy.text("""
+    SELECT
+      (SELECT COUNT(*) FROM budget_accounts) AS accounts,
+      (SELECT MAX(account_updated_at) FROM budget_accounts)
+        AS account_updated_at,
+      (SELECT COUNT(*) FROM budget_budgets) AS budgets,
+      (SELECT MAX(budget_updated_at) FROM budget_budgets) AS budget_updated_at
+    """)
+  result = flask.g.db.execute(query).first()
+  current = get_current_fyear()
+  fyear_ids = tuple(r["fyear_id"] for r in get_fyears())
+  return tuple(result) + (current["fyear_id"] if current else None, fyear_ids)
+
+
+@request_memoized
 def get_account_summary():
   """Gets the status of all accounts."""
   query = sqlalchemy.text("""
-    SELECT account_name,
-      initial_balance - IFNULL(SUM(amount), 0) AS bal
+    SELECT account_id, account_name, initial_balance,
+      initial_balance - posted_amount AS bal
     FROM budget_accounts
-      NATURAL LEFT JOIN (
-        SELECT account_id, amount
-        FROM budget_payments
-        WHERE date_posted IS NOT NULL) AS t
-    GROUP BY account_id
     ORDER BY account_name
     """)
-  # you can't pull the WHERE outside the join, because if no payments
-  # have posted, the account won't show up
 
   return flask.g.db.execute(query).fetchall()
 
 
+@request_memoized
 def get_budget_summary(fyear_id):
   """Gets the status of all budgets for the given fiscal year."""
   query = sqlalchemy.text("""
-    SELECT *,
+    SELECT budget_name, starting_amount, spent,
       starting_amount - spent AS remaining
-    FROM (
-      SELECT budget_name, starting_amount, IFNULL(SUM(cost), 0) AS spent
-      FROM budget_budgets
-        NATURAL JOIN budget_fyears
-        NATURAL LEFT JOIN budget_expenses
-      WHERE fyear_id = (:f)
-      GROUP BY budget_id
-      ORDER BY budget_name
-    ) AS t
+    FROM budget_budgets
+    WHERE fyear_id = (:f)
+    ORDER BY budget_name
     """)
 
   return flask.g.db.execute(query, f=fyear_id).fetchall()
@@ -298,6 +441,67 @@ def get_unposted_payments():
   return flask.g.db.execute(query)
 
 # ==== SQL UPDATES ====
+# Each budget's total spending (budget_budgets.spent) and each account's total
+# posted payments (budget_accounts.posted_amount) are stored rather than summed
+# on every summary view. Every function below that changes expenses or
+# payments also adjusts these totals, in the same transaction.
+
+def adjust_budget_spent(budget_id, delta):
+  """Adds delta to the stored total spent from the given budget."""
+  query = sqlalchemy.text("""
+    UPDATE budget_budgets
+    SET spent = spent + (:delta)
+    WHERE budget_id = (:b_id)
+  """)
+
+  flask.g.db.execute(query, delta=delta, b_id=budget_id)
+
+
+def adjust_account_posted(account_id, delta):
+  """Adds delta to the stored total of posted payments from the account."""
+  query = sqlalchemy.text("""
+    UPDATE budget_accounts
+    SET posted_amount = posted_amount + (:delta)
+    WHERE account_id = (:a_id)
+  """)
+
+  flask.g.db.execute(query, delta=delta, a_id=account_id)
+
+
+def lock_expense(expense_id):
+  """
+  Gets the budget and cost of the given expense, or None, locking its row
+  until the end of the current transaction.
+  """
+  query = sqlalchemy.text("""
+    SELECT budget_id, cost
+    FROM budget_expenses
+    WHERE expense_id = (:e)
+    FOR UPDATE
+  """)
+
+  return flask.g.db.execute(query, e=expense_id).first()
+
+
+def lock_payment(payment_id):
+  """
+  Gets the account, amount and posting date of the given payment, or None,
+  locking its row until the end of the current transaction.
+  """
+  query = sqlalchemy.text("""
+    SELECT account_id, amount, date_posted
+    FROM budget_payments
+    WHERE payment_id = (:p)
+    FOR UPDATE
+  """)
+
+  return flask.g.db.execute(query, p=payment_id).first()
+
+
+def get_posted_amount(payment):
+  """Returns how much the payment counts towards its account's balance."""
+  return payment["amount"] if payment["date_posted"] is not None else 0
+
 
 def record_expense(budget_id, date_incurred, description, amount, payment_id,
     payee_id):
@@ -310,15 +514,22 @@ def record_expense(budget_id, date_incurred, description, amount, payment_id,
       ((:b_id), (:d_inc), (:descr), (:cost), (:p_id), (:payee_id))
   """)
 
-  flask.g.db.execute(
-    query,
-    b_id=budget_id,
-    d_inc=date_incurred,
-    descr=description,
-    cost=amount,
-    p_id=payment_id,
-    payee_id=payee_id
-  )
+  transaction = flask.g.db.begin()
+  try:
+    flask.g.db.execute(
+      query,
+      b_id=budget_id,
+      d_inc=date_incurred,
+      descr=description,
+      cost=amount,
+      p_id=payment_id,
+      payee_id=payee_id
+    )
+    adjust_budget_spent(budget_id, amount)
+    transaction.commit()
+  except Exception:
+    transaction.rollback()
+    raise
 
 
 def edit_expense(expense_id, budget_id, date_incurred, description, amount, payee_id):
@@ -338,17 +549,29 @@ def edit_expense(expense_id, budget_id, date_incurred, description, amount, paye
       expense_id = (:expense_id)
   """)
 
-  rp = flask.g.db.execute(
-    query,
-    expense_id=expense_id,
-    budget_id=budget_id,
-    date_incurred=date_incurred,
-    description=description,
-    amount=amount,
-    payee_id=payee_id
-  )
+  transaction = flask.g.db.begin()
+  try:
+    old = lock_expense(expense_id)
+    if old is None:
+      transaction.commit()
+      return False
+    flask.g.db.execute(
+      query,
+      expense_id=expense_id,
+      budget_id=budget_id,
+      date_incurred=date_incurred,
+      description=description,
+      amount=amount,
+      payee_id=payee_id
+    )
+    adjust_budget_spent(old["budget_id"], -old["cost"])
+    adjust_budget_spent(budget_id, amount)
+    transaction.commit()
+  except Exception:
+    transaction.rollback()
+    raise
 
-  return rp.rowcount != 0
+  return True
 
 
 def delete_expense(expense_id):
@@ -361,12 +584,23 @@ def delete_expense(expense_id):
     WHERE expense_id = (:expense_id)
   """)
 
-  rp = flask.g.db.execute(
-    query,
-    expense_id=expense_id,
-  )
+  transaction = flask.g.db.begin()
+  try:
+    old = lock_expense(expense_id)
+    if old is None:
+      transaction.commit()
+      return False
+    flask.g.db.execute(
+      query,
+      expense_id=expense_id,
+    )
+    adjust_budget_spent(old["budget_id"], -old["cost"])
+    transaction.commit()
+  except Exception:
+    transaction.rollback()
+    raise
 
-  return rp.rowcount != 0
+  return True
 
 def edit_payment(payment_id, amount, date_written, payee_id, payment_type):
   """
@@ -384,16 +618,29 @@ def edit_payment(payment_id, amount, date_written, payee_id, payment_type):
       payment_id = (:payment_id)
   """)
 
-  rp = flask.g.db.execute(
-    query,
-    date_written=date_written,
-    amount=amount,
-    payee_id=payee_id,
-    payment_id=payment_id,
-    payment_type=payment_type
-  )
+  transaction = flask.g.db.begin()
+  try:
+    old = lock_payment(payment_id)
+    if old is None:
+      transaction.commit()
+      return False
+    flask.g.db.execute(
+      query,
+      date_written=date_written,
+      amount=amount,
+      payee_id=payee_id,
+      payment_id=payment_id,
+      payment_type=payment_type
+    )
+    if old["date_posted"] is not None:
+      adjust_account_posted(old["account_id"], -old["amount"])
+      adjust_account_posted(old["account_id"], amount)
+    transaction.commit()
+  except Exception:
+    transaction.rollback()
+    raise
 
-  return rp.rowcount != 0
+  return True
 
 def delete_payment(payment_id):
   """
@@ -405,12 +652,23 @@ def delete_payment(payment_id):
     WHERE payment_id = (:payment_id)
   """)
 
-  rp = flask.g.db.execute(
-    query,
-    payment_id=payment_id,
-  )
+  transaction = flask.g.db.begin()
+  try:
+    old = lock_payment(payment_id)
+    if old is None:
+      transaction.commit()
+      return False
+    flask.g.db.execute(
+      query,
+      payment_id=payment_id,
+    )
+    adjust_account_posted(old["account_id"], -get_posted_amount(old))
+    transaction.commit()
+  except Exception:
+    transaction.rollback()
+    raise
 
-  return rp.rowcount != 0
+  return True
 
 def record_payment(account_id, payment_type, amount, date_written, date_posted,
     payee_id, check_no):
@@ -424,16 +682,24 @@ def record_payment(account_id, payment_type, amount, date_written, date_posted,
       ((:a_id), (:t), (:amount), (:d_writ), (:d_post), (:payee_id), (:check_no))
   """)
 
-  result = flask.g.db.execute(
-    query,
-    a_id=account_id,
-    t=payment_type,
-    amount=amount,
-    d_writ=date_written,
-    d_post=date_posted,
-    payee_id=payee_id,
-    check_no=check_no
-  )
+  transaction = flask.g.db.begin()
+  try:
+    result = flask.g.db.execute(
+      query,
+      a_id=account_id,
+      t=payment_type,
+      amount=amount,
+      d_writ=date_written,
+      d_post=date_posted,
+      payee_id=payee_id,
+      check_no=check_no
+    )
+    if date_posted is not None:
+      adjust_account_posted(account_id, amount)
+    transaction.commit()
+  except Exception:
+    transaction.rollback()
+    raise
 
   return result.lastrowid
 
@@ -452,6 +718,8 @@ def record_new_payee(payee_name):
 def mark_as_paid(payee_id, payment_id):
   """
   Assigns the given payment id to all unpaid expenses from the given payee.
+  This doesn't change any stored totals: budgets are charged when expenses
+  are recorded, and accounts when payments are posted.
   """
   query = sqlalchemy.text("""
     UPDATE budget_expenses
@@ -470,11 +738,21 @@ def post_payment(payment_id, date_posted):
     WHERE payment_id = (:pi)
   """)
 
-  flask.g.db.execute(query, dp=date_posted, pi=payment_id)
+  transaction = flask.g.db.begin()
+  try:
+    old = lock_payment(payment_id)
+    if old is not None:
+      flask.g.db.execute(query, dp=date_posted, pi=payment_id)
+      if old["date_posted"] is None:
+        adjust_account_posted(old["account_id"], old["amount"])
+    transaction.commit()
+  except Exception:
+    transaction.rollback()
+    raise
 
 
 def void_payment(payment_id):
-  """Marks the given payment as posted, with the given date."""
+  """Deletes the given payment, marking its expenses as unpaid."""
   transaction = flask.g.db.begin()
   try:
     # Wipe payment ID from expenses
@@ -490,14 +768,77 @@ def void_payment(payment_id):
       WHERE payment_id = (:pi)
     """)
 
+    old = lock_payment(payment_id)
     flask.g.db.execute(query, pi=payment_id)
     flask.g.db.execute(query2, pi=payment_id)
+    if old is not None:
+      adjust_account_posted(old["account_id"], -get_posted_amount(old))
     transaction.commit()
 
   except Exception:
     transaction.rollback()
     flask.flash("An unexpected error occurred. Please find an IMSS rep.")
 
+
+def get_total_drift():
+  """
+  Compares the stored budget and account totals against totals computed from
+  scratch. Returns a list of (kind, id, name, stored, actual) tuples for each
+  budget or account whose stored total is wrong.
+  """
+  budget_query = sqlalchemy.text("""
+    SELECT budget_id, budget_name, spent, IFNULL(SUM(cost), 0) AS actual
+    FROM budget_budgets
+      NATURAL LEFT JOIN budget_expenses
+    GROUP BY budget_id
+    HAVING spent <> actual
+  """)
+  account_query = sqlalchemy.text("""
+    SELECT account_id, account_name, posted_amount,
+      IFNULL(SUM(amount), 0) AS actual
+    FROM budget_accounts
+      NATURAL LEFT JOIN (
+        SELECT account_id, amount
+        FROM budget_payments
+        WHERE date_posted IS NOT NULL) AS t
+    GROUP BY account_id
+    HAVING posted_amount <> actual
+  """)
+
+  drift = [("budget", r["budget_id"], r["budget_name"], r["spent"], r["actual"])
+      for r in flask.g.db.execute(budget_query)]
+  drift += [("account", r["account_id"], r["account_name"], r["posted_amount"],
+      r["actual"]) for r in flask.g.db.execute(account_query)]
+  return drift
+
+
+def rebuild_totals():
+  """Recomputes every stored budget and account total from scratch."""
+  budget_query = sqlalchemy.text("""
+    UPDATE budget_budgets
+    SET spent = (
+      SELECT IFNULL(SUM(cost), 0)
+      FROM budget_expenses
+      WHERE budget_expenses.budget_id = budget_budgets.budget_id)
+  """)
+  account_query = sqlalchemy.text("""
+    UPDATE budget_accounts
+    SET posted_amount = (
+      SELECT IFNULL(SUM(amount), 0)
+      FROM budget_payments
+      WHERE budget_payments.account_id = budget_accounts.account_id
+        AND date_posted IS NOT NULL)
+  """)
+
+  transaction = flask.g.db.begin()
+  try:
+    flask.g.db.execute(budget_query)
+    flask.g.db.execute(account_query)
+    transaction.commit()
+  except Exception:
+    transaction.rollback()
+    raise
+
 # ==== VALIDATION ====
 
 def test_predicates(triplets, flash=True):
@@ -541,47 +882,51 @@ def validate_payee(payee_id, payee_name):
 
 
 def download_expenses():
-  expenses = get_transactions()
+  """
+  Streams the list of all expenses as a CSV file. Rows are read from the
+  database with a server-side cursor and written out in chunks, so memory use
+  does not grow with the number of expenses.
+  """
+  query = sqlalchemy.text("""
+    SELECT expense_id, budget_name, fyear_num, date_incurred, description,
+      cost, payment_id, payee_name, payment_type, account_name, check_no
+    FROM budget_expenses LEFT JOIN budget_payments USING(payment_id)
+      NATURAL JOIN budget_budgets
+      NATURAL JOIN budget_fyears
+      NATURAL LEFT JOIN budget_accounts
+      LEFT JOIN budget_payees ON budget_expenses.payee_id = budget_payees.payee_id
+    ORDER BY expense_id DESC
+    """)
   ptypes = PaymentType.get_all()
-  fields = ["expense_id", "budget_name", "fyear_num", "date_incurred",
-            "description", "cost", "payment_id", "payee_name", "payment_type",
-            "account_name", "check_no"]
   # If the first title is "ID" there is a formatting issue with Excel
   titles = ["Expense ID", "Budget", "FY", "Date Incurred", "Description",
             "Amount", "Payment ID", "Payee", "Type", "Account", "Check"]
 
-  # References: stackoverflow.com/a/45111660 and stackoverflow.com/a/14614920
-  proxy = io.StringIO()
-  wr = csv.DictWriter(proxy, fields)
-  wr.writerow(dict(zip(fields, titles)))
-  for db_row in expenses:
-    csv_row = {key: db_row[key] for key in fields}
-    if csv_row["payment_type"] is not None:
-      csv_row["payment_type"] = ptypes[csv_row["payment_type"]]
-    wr.writerow(csv_row)
-
-  download = io.BytesIO()
-  download.write(proxy.getvalue().encode())
-  download.seek(0)
-  proxy.close()
-
-  return flask.send_file(download, as_attachment=True,
-                         attachment_filename="expenses.csv")
+  def generate():
+    chunk = io.StringIO()
+    wr = csv.writer(chunk)
+    wr.writerow(titles)
+    result = flask.g.db.execution_options(stream_results=True).execute(query)
+    try:
+      for db_row in result:
+        csv_row = list(db_row)
+        if db_row["payment_type"] is not None:
+          csv_row[8] = ptypes[db_row["payment_type"]]
+        wr.writerow(csv_row)
+        if chunk.tell() >= EXPORT_CHUNK_SIZE:
+          yield chunk.getvalue()
+          chunk.seek(0)
+          chunk.truncate()
+    finally:
+      result.close()
+    yield chunk.getvalue()
+
+  return flask.Response(flask.stream_with_context(generate()),
+      mimetype="text/csv",
+      headers={"Content-Disposition": "attachment; filename=expenses.csv"})
 
 def download_summaries(fyear_id):
-  query = sqlalchemy.text("""
-    SELECT account_id, account_name, initial_balance, 
-      initial_balance - IFNULL(SUM(amount), 0) AS bal
-    FROM budget_accounts
-      NATURAL LEFT JOIN (
-        SELECT account_id, amount
-        FROM budget_payments
-        WHERE date_posted IS NOT NULL) AS t
-    GROUP BY account_id
-    ORDER BY account_name
-    """)
-
-  accounts = flask.g.db.execute(query).fetchall()
+  accounts = get_account_summary()
 
   budgets = get_budget_summary(fyear_id)
   account_fields = ["account_id", "account_name", "initial_balance", "bal"]
@@ -4,6 +4,7 @@ import http
 from datetime import datetime  # ugh
 from decimal import Decimal
 
+from ruddock import http_cache_utils
 from ruddock.resources import Permissions
 from ruddock.decorators import login_required, get_args_from_form
 from ruddock.modules.budget import blueprint, helpers
@@ -19,6 +20,7 @@ def route_portal():
 
 @blueprint.route('/summary')
 @login_required(Permissions.BUDGET)
+@http_cache_utils.conditional(helpers.get_summary_version)
 def route_summary():
   """Displays account and budget summaries."""
 
@@ -56,9 +58,20 @@ def route_download_summaries():
 @blueprint.route('/expenses')
 @login_required(Permissions.BUDGET)
 def route_expenses():
-  """Displays list of expenses."""
+  """Displays one page of the (optionally filtered) list of expenses."""
+  filters = helpers.get_ledger_filters(flask.request.args)
+  expenses, has_older, has_newer = helpers.get_expenses_page(filters,
+    before=helpers.get_page_key(flask.request.args, "before"),
+    after=helpers.get_page_key(flask.request.args, "after"))
   return flask.render_template('expenses.html',
-    expenses=helpers.get_transactions(),
+    expenses=expenses,
+    has_older=has_older,
+    has_newer=has_newer,
+    filters=filters,
+    fyears=helpers.get_fyears(),
+    budgets=helpers.get_all_budgets(),
+    payees=helpers.get_payees(),
+    accounts=helpers.get_accounts(),
     ptypes=PaymentType.get_all())
 
 
@@ -72,9 +85,18 @@ def route_download_expenses():
 @blueprint.route('/payments')
 @login_required(Permissions.BUDGET)
 def route_payments():
-  """Displays list of payments."""
+  """Displays one page of the (optionally filtered) list of payments."""
+  filters = helpers.get_ledger_filters(flask.request.args)
+  payments, has_older, has_newer = helpers.get_payments_page(filters,
+    before=helpers.get_page_key(flask.request.args, "before"),
+    after=helpers.get_page_key(flask.request.args, "after"))
   return flask.render_template('payments.html',
-    payments=helpers.get_payments(),
+    payments=payments,
+    has_older=has_older,
+    has_newer=has_newer,
+    filters=filters,
+    payees=helpers.get_payees(),
+    accounts=helpers.get_accounts(),
     ptypes=PaymentType.get_all())
 
 
@@ -0,0 +1,98 @@
+import collections
+import datetime
+import hashlib
+import flask
+import sqlalchemy
+
+from ruddock import cache_utils
+from ruddock import constants
+from ruddock import office_utils
+
+# The rendered list of current offices, with an ETag for it and the time it
+# was rendered.
+OfficesPage = collections.namedtuple("OfficesPage",
+    ["html", "etag", "last_modified"])
+
+page_cache = cache_utils.Cache(constants.GOVERNMENT_PAGE_TTL)
+PAGE_KEY = "offices"
+
+def get_assignment_data(assignments):
+  """
+  Organizes assignments by type (excomm and ucc are special). Returns a list
+  of tuples with name, email, and assignments, so that the template can parse
+  them efficiently.
+  """
+  excomm = []
+  ucc = []
+  other = []
+  for assignment in assignments:
+    if assignment['is_excomm']:
+      excomm.append(assignment)
+    elif assignment['is_ucc']:
+      ucc.append(assignment)
+    else:
+      other.append(assignment)
+
+  ucc.sort(key=lambda x: x['office_name'])
+  other.sort(key=lambda x: x['office_name'])
+
+  return [
+    ('Executive Committee', 'excomm', excomm),
+    ('Upperclass Counselors', 'uccs', ucc),
+    ('Other Offices', None, other)
+  ]
+
+def get_next_change():
+  """
+  Returns the datetime at which the set of current assignments next changes
+  (when an assignment starts or ends), or None if no changes are scheduled.
+  """
+  query = sqlalchemy.text("""
+    SELECT MIN(change_date) AS next_change
+    FROM (
+      SELECT start_date AS change_date
+      FROM office_assignments
+      WHERE start_date > NOW()
+      UNION ALL
+      SELECT end_date
+      FROM office_assignments
+      WHERE start_date < NOW() AND end_date > NOW()
+    ) AS changes
+    """)
+  next_change = flask.g.db.execute(query).scalar()
+  if next_change is None:
+    return None
+  # Assignments are compared with NOW(), so a date takes effect at midnight.
+  return datetime.datetime.combine(next_change, datetime.time())
+
+def render_offices_page():
+  """Renders the list of current offices, returning an OfficesPage."""
+  assignments = office_utils.get_current_assignments()
+  html = flask.render_template('government_offices.html',
+      assignment_data=get_assignment_data(assignments))
+  etag = hashlib.md5(html.encode()).hexdigest()
+  last_modified = datetime.datetime.utcnow().replace(microsecond=0)
+  return OfficesPage(html, etag, last_modified)
+
+def get_offices_page():
+  """
+  Returns the rendered list of current offices as an OfficesPage. It is
+  cached until an assignment starts or ends, invalidate_offices_page() is
+  called, or constants.GOVERNMENT_PAGE_TTL seconds pass, whichever is first.
+  """
+  page = page_cache.get(PAGE_KEY)
+  if page is not None:
+    return page
+  page = render_offices_page()
+  ttl = constants.GOVERNMENT_PAGE_TTL
+  next_change = get_next_change()
+  if next_change is not None:
+    seconds = (next_change - datetime.datetime.now()).total_seconds()
+    # Expire just after the change, but always cache for at least a second.
+    ttl = max(1, min(ttl, seconds + 1))
+  page_cache.set(PAGE_KEY, page, ttl)
+  return page
+
+def invalidate_offices_page():
+  """Discards the cached list of offices. Call this when assignments change."""
+  page_cache.invalidate(PAGE_KEY)
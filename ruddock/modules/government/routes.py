@@ -1,34 +1,14 @@
 import flask
 
-from ruddock import office_utils
-from ruddock.modules.government import blueprint
+from ruddock import http_cache_utils
+from ruddock.modules.government import blueprint, helpers
 
 @blueprint.route('/')
+@http_cache_utils.conditional(
+    lambda: helpers.get_offices_page().etag,
+    last_modified=lambda: helpers.get_offices_page().last_modified)
 def government_home():
   """Get current assignments."""
-  assignments = office_utils.get_current_assignments()
-
-  # Organize by type (excomm and ucc are special)
-  excomm = []
-  ucc = []
-  other = []
-  for assignment in assignments:
-    # Organize by type
-    if assignment['is_excomm']:
-      excomm.append(assignment)
-    elif assignment['is_ucc']:
-      ucc.append(assignment)
-    else:
-      other.append(assignment)
-
-  ucc.sort(key=lambda x: x['office_name'])
-  other.sort(key=lambda x: x['office_name'])
-
-  # Tuple with name, email, and users, so that template can parse efficiently
-  assignment_data = [
-    ('Executive Committee', 'excomm', excomm),
-    ('Upperclass Counselors', 'uccs', ucc),
-    ('Other Offices', None, other)
-  ]
+  page = helpers.get_offices_page()
   return flask.render_template('government.html',
-      assignment_data=assignment_data)
+      offices=flask.Markup(page.html))
@@ -1,6 +1,8 @@
 import flask
 import sqlalchemy
 
+from ruddock.cache_utils import reference_data
+
 alleys = [1, 2, 3, 4, 5, 6]
 
 def get_all_members():
@@ -24,7 +26,7 @@ def get_rising_members():
     SELECT user_id
     FROM members NATURAL JOIN members_current
     WHERE member_type = 1
-      AND CONCAT(graduation_year, '-07-01') > NOW() + INTERVAL 1 YEAR
+      AND graduation_year > YEAR(NOW() + INTERVAL 6 MONTH)
     """)
   return flask.g.db.execute(query).fetchall()
 
@@ -34,7 +36,7 @@ def get_frosh():
     SELECT user_id
     FROM members NATURAL JOIN members_current
     WHERE member_type = 1
-      AND CONCAT(graduation_year, '-07-01') > NOW() + INTERVAL 3 YEAR
+      AND graduation_year > YEAR(NOW() + INTERVAL 30 MONTH)
     """)
   return flask.g.db.execute(query).fetchall()
 
@@ -69,30 +71,31 @@ def get_available_participants():
 
 def set_participants(participants):
   """Sets hassle participants."""
-  # Delete old participants.
-  delete_query = sqlalchemy.text("DELETE FROM hassle_participants")
-  flask.g.db.execute(delete_query)
-
-  # Insert new participants.
-  insert_query = sqlalchemy.text("""
-    INSERT INTO hassle_participants (user_id)
-    VALUES (:p)
-    """)
-  for participant in participants:
-    flask.g.db.execute(insert_query, p=participant)
+  update_id_table("hassle_participants", "user_id", participants)
 
-def get_all_rooms():
+@reference_data("rooms")
+def get_rooms():
   """Gets all rooms in the house."""
   query = sqlalchemy.text("""
-    SELECT room_number, alley,
-      room_number IN (
-        SELECT room_number FROM hassle_rooms
-      ) AS participating
+    SELECT room_number, alley
     FROM rooms
     ORDER BY room_number
     """)
   return flask.g.db.execute(query).fetchall()
 
+def get_all_rooms():
+  """
+  Gets all rooms in the house, each as a dict with its room_number and alley,
+  and whether it is participating in the hassle.
+  """
+  query = sqlalchemy.text("SELECT room_number FROM hassle_rooms")
+  participating = set(row['room_number'] for row in flask.g.db.execute(query))
+  return [{
+    'room_number': room['room_number'],
+    'alley': room['alley'],
+    'participating': room['room_number'] in participating,
+  } for room in get_rooms()]
+
 def get_participating_rooms():
   """Gets all rooms participating in the hassle."""
   query = sqlalchemy.text("""
@@ -114,27 +117,55 @@ def get_available_rooms():
     """)
   return flask.g.db.execute(query).fetchall()
 
-def get_rooms_remaining():
+def get_rooms_remaining(available_rooms=None):
   """
   Gets the number of rooms remaining for each alley.
-  Returns a dict mapping alley to number of remaining rooms.
+  Returns a dict mapping alley to number of remaining rooms. If the result of
+  get_available_rooms() is already known, it can be passed in to avoid running
+  the query again.
   """
   alley_counts = dict(zip(alleys, [0] * len(alleys)))
-  available_rooms = get_available_rooms()
+  if available_rooms is None:
+    available_rooms = get_available_rooms()
   for room in available_rooms:
     alley_counts[room['alley']] += 1
   return alley_counts
 
 def set_rooms(rooms):
   """Sets rooms available for hassle."""
-  # Delete old rooms.
-  delete_query = sqlalchemy.text("DELETE FROM hassle_rooms")
-  flask.g.db.execute(delete_query)
+  update_id_table("hassle_rooms", "room_number", rooms)
+
+def update_id_table(table, column, ids):
+  """
+  Makes the set of values in a single column table equal to ids. Only values
+  that changed are deleted or inserted, using at most one DELETE and one
+  (multi-row) INSERT inside a single transaction. Resubmitting an unchanged
+  selection therefore doesn't write anything.
+  """
+  # Table and column names are never user input, so formatting is safe here.
+  select_query = sqlalchemy.text("SELECT {0} FROM {1}".format(column, table))
+  current_ids = set(row[column] for row in flask.g.db.execute(select_query))
+  ids = set(ids)
+  removed_ids = current_ids - ids
+  added_ids = ids - current_ids
+  if not removed_ids and not added_ids:
+    return
 
-  # Insert rooms
-  insert_query = sqlalchemy.text("INSERT INTO hassle_rooms (room_number) VALUES (:r)")
-  for room in rooms:
-    flask.g.db.execute(insert_query, r=room)
+  transaction = flask.g.db.begin()
+  try:
+    if removed_ids:
+      delete_query = sqlalchemy.text(
+          "DELETE FROM {1} WHERE {0} IN :ids".format(column, table)
+          ).bindparams(sqlalchemy.bindparam("ids", expanding=True))
+      flask.g.db.execute(delete_query, ids=sorted(removed_ids))
+    if added_ids:
+      insert_query = sqlalchemy.text(
+          "INSERT INTO {1} ({0}) VALUES (:id)".format(column, table))
+      flask.g.db.execute(insert_query, [{"id": x} for x in sorted(added_ids)])
+    transaction.commit()
+  except Exception:
+    transaction.rollback()
+    raise
 
 def get_events():
   """Returns events in the hassle."""
@@ -150,13 +181,17 @@ def get_events():
   return flask.g.db.execute(query).fetchall()
 
 def get_events_with_roommates():
-  """Returns events with additional roommate information."""
+  """
+  Returns events with additional roommate information. This always takes two
+  queries, regardless of the number of events.
+  """
   events = get_events()
+  roommates_by_user = get_all_roommates()
   results = []
 
   for event in events:
     row_dict = dict(event.items())
-    roommates = get_roommates(event['user_id'])
+    roommates = roommates_by_user.get(event['user_id'], [])
     row_dict['roommates'] = roommates
     occupant_names = [event['name']]
     for roommate in roommates:
@@ -201,17 +236,22 @@ def clear_events(event_id=None):
     flask.g.db.execute(sqlalchemy.text("DELETE FROM hassle_roommates"))
     flask.g.db.execute(sqlalchemy.text("DELETE FROM hassle_events"))
 
-def get_roommates(user_id):
-  """Gets all roommates for the provided user."""
+def get_all_roommates():
+  """
+  Gets roommates for every hassle event. Returns a dict mapping the user_id of
+  the member who picked the room to a list of their roommates.
+  """
   query = sqlalchemy.text("""
-    SELECT roommate_id, name
+    SELECT hassle_roommates.user_id, roommate_id, name
     FROM hassle_roommates
       JOIN members ON hassle_roommates.roommate_id = members.user_id
       JOIN members_extra ON members.user_id = members_extra.user_id
-    WHERE hassle_roommates.user_id=:u
     ORDER BY name
     """)
-  return flask.g.db.execute(query, u=user_id).fetchall()
+  roommates_by_user = {}
+  for roommate in flask.g.db.execute(query):
+    roommates_by_user.setdefault(roommate['user_id'], []).append(roommate)
+  return roommates_by_user
 
 def clear_all():
   """Clears all current hassle data."""
@@ -11,7 +11,7 @@ def run_hassle():
   """Logic for room hassles."""
   available_participants = helpers.get_available_participants()
   available_rooms = helpers.get_available_rooms()
-  rooms_remaining = helpers.get_rooms_remaining()
+  rooms_remaining = helpers.get_rooms_remaining(available_rooms)
   events = helpers.get_events_with_roommates()
 
   return flask.render_template('hassle.html',
@@ -1,7 +1,10 @@
+import bisect
 import flask
 import sqlalchemy
 import html
 
+from ruddock.cache_utils import reference_data
+
 DINNERS = list(range(1, 9))
 BUCKETS = ['-2', '-1', '0', '0.5', '1', '1.5', '2', '3']
 VOTE_TUPLES = [
@@ -113,9 +116,50 @@ def smoothed_average(row):
     # distribution of prefrosh ratings, as well as avoid dividing by zero.
     return (sum_votes + 1.0) / (num_votes + 1.0)
 
+def assign_buckets(prefrosh_rows, buckets):
+  """
+  Finds the nearest bucket for each prefrosh's smoothed average. Buckets should
+  be a dict mapping bucket_id to the bucket's numeric value. Exact ties (like
+  2.5 between 2 and 3) go to the higher bucket.
+
+  Returns a dict mapping prefrosh_id to bucket_id.
+  """
+  sorted_buckets = sorted((value, bucket_id)
+      for bucket_id, value in buckets.items())
+  values = [value for value, bucket_id in sorted_buckets]
+
+  assignments = {}
+  for row in prefrosh_rows:
+    avg = smoothed_average(row)
+    # The nearest bucket is either the first bucket >= avg or the one below it.
+    idx = bisect.bisect_left(values, avg)
+    if idx == len(values):
+      idx -= 1
+    elif idx > 0 and avg - values[idx - 1] < values[idx] - avg:
+      idx -= 1
+    assignments[row['prefrosh_id']] = sorted_buckets[idx][1]
+  return assignments
+
+@reference_data("rotation_buckets")
+def get_buckets():
+  """Gets list of all buckets."""
+  query = sqlalchemy.text("""
+    SELECT bucket_id, bucket_name
+    FROM rotation_buckets
+  """)
+  return flask.g.db.execute(query).fetchall()
+
 def compute_buckets():
+  """
+  Moves every prefrosh into the bucket nearest their smoothed average. Only
+  prefrosh whose bucket changed are updated, using a single UPDATE.
+
+  Returns a dict mapping each bucket name to the number of prefrosh moved into
+  that bucket.
+  """
   query = sqlalchemy.text("""
     SELECT prefrosh_id,
+           bucket_id,
            votes_neg_two,
            votes_neg_one,
            votes_zero,
@@ -126,33 +170,42 @@ def compute_buckets():
   """)
   results = flask.g.db.execute(query).fetchall()
 
-  query2 = sqlalchemy.text("""
-    SELECT bucket_id, bucket_name
-    FROM rotation_buckets
-  """)
-  buckets = flask.g.db.execute(query2).fetchall()
-  buckets = {r['bucket_id']:float(r['bucket_name']) for r in buckets}
+  bucket_rows = get_buckets()
+  buckets = {r['bucket_id']: float(r['bucket_name']) for r in bucket_rows}
+  bucket_names = {r['bucket_id']: r['bucket_name'] for r in bucket_rows}
+
+  assignments = assign_buckets(results, buckets)
+
+  # Group the prefrosh that moved by their new bucket.
+  moved = {}
+  for r in results:
+    new_bucket_id = assignments[r['prefrosh_id']]
+    if new_bucket_id != r['bucket_id']:
+      moved.setdefault(new_bucket_id, []).append(r['prefrosh_id'])
+
+  summary = {name: 0 for name in bucket_names.values()}
+  if len(moved) == 0:
+    return summary
+
+  # Build one UPDATE with a CASE branch per destination bucket.
+  cases = []
+  bind_params = [sqlalchemy.bindparam('pids', expanding=True)]
+  params = {'pids': []}
+  for i, (bucket_id, prefrosh_ids) in enumerate(sorted(moved.items())):
+    cases.append("WHEN prefrosh_id IN :pids_{0} THEN :bid_{0}".format(i))
+    bind_params.append(sqlalchemy.bindparam('pids_' + str(i), expanding=True))
+    params['pids_' + str(i)] = prefrosh_ids
+    params['bid_' + str(i)] = bucket_id
+    params['pids'].extend(prefrosh_ids)
+    summary[bucket_names[bucket_id]] = len(prefrosh_ids)
 
   update = sqlalchemy.text("""
     UPDATE rotation_prefrosh
-    SET bucket_id=(:bid)
-    WHERE prefrosh_id=(:pid)
-  """)
-  # TODO this _cannot_ be efficient... how can I do a bulk insert in SQL Alchemy?
-  for r in results:
-    pid = r['prefrosh_id']
-    avg = smoothed_average(r)
-
-    best_match_idx = 0
-    best_error = 100000
-    for i in buckets:
-      error = abs(avg - buckets[i])
-      # The second case is for breaking an exact tie, like 2.5 between 2 and 3
-      if (error < best_error) or (error == best_error and avg < buckets[i]):
-        best_error = error
-        best_match_idx = i
-
-    flask.g.db.execute(update, bid=best_match_idx, pid=pid)
+    SET bucket_id = CASE {0} END
+    WHERE prefrosh_id IN :pids
+  """.format(' '.join(cases))).bindparams(*bind_params)
+  flask.g.db.execute(update, **params)
+  return summary
 
 def format_name(first, last, preferred):
   """Sticks together the parts of a prefrosh's name, including preferred."""
@@ -62,7 +62,14 @@ def update_comment(prefrosh_id):
 @blueprint.route('/compute_buckets', methods=['POST'])
 @login_required(Permissions.ROTATION)
 def compute_buckets():
-  helpers.compute_buckets()
+  """Recomputes every prefrosh's bucket from their votes."""
+  summary = helpers.compute_buckets()
+  moved = ["{0} to {1}".format(summary[bucket], bucket)
+      for bucket in helpers.BUCKETS if summary.get(bucket, 0) > 0]
+  if moved:
+    flask.flash("Moved " + ", ".join(moved) + ".")
+  else:
+    flask.flash("No prefrosh changed buckets.")
   return flask.redirect(flask.url_for("rotation.show_portal"))
 
 @blueprint.route('/move')
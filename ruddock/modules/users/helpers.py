@@ -3,6 +3,7 @@ import sqlalchemy
 from collections import OrderedDict
 
 from ruddock import auth_utils
+from ruddock.cache_utils import request_memoized
 from ruddock.resources import Permissions
 
 def get_memberlist(search_type):
@@ -49,6 +50,48 @@ def get_memberlist(search_type):
   query = sqlalchemy.text(sqlText.format(tables))
   return flask.g.db.execute(query).fetchall()
 
+def get_memberlist_version():
+  """
+  Returns a value which changes whenever the member list does, for
+  http_cache_utils.conditional. Members become alumni on July 1st, so the
+  graduation year cutoff is included too. The list also shows membership
+  descriptions, and membership_types has no timestamp, so they are included
+  as is.
+  """
+  query = sqlalchemy.text("""
+    SELECT
+      (SELECT COUNT(*) FROM members) AS members,
+      (SELECT MAX(member_updated_at) FROM members) AS member_updated_at,
+      (SELECT COUNT(*) FROM users) AS users,
+      (SELECT MAX(user_updated_at) FROM users) AS user_updated_at,
+      (SELECT GROUP_CONCAT(membership_desc ORDER BY member_type)
+        FROM membership_types) AS membership_descs,
+      YEAR(NOW() - INTERVAL 6 MONTH) AS cutoff
+    """)
+  return tuple(flask.g.db.execute(query).first())
+
+def get_profile_version(username):
+  """
+  Returns a value which changes whenever the user's profile does, for
+  http_cache_utils.conditional. The membership description is shown on the
+  profile too, and membership_types has no timestamp, so it is included as is.
+  """
+  query = sqlalchemy.text("""
+    SELECT member_updated_at, user_updated_at, membership_desc,
+      (SELECT COUNT(*)
+        FROM office_assignments
+        WHERE office_assignments.user_id = users.user_id) AS assignments,
+      (SELECT MAX(assignment_updated_at)
+        FROM office_assignments
+        WHERE office_assignments.user_id = users.user_id
+      ) AS assignment_updated_at
+    FROM members NATURAL JOIN membership_types NATURAL JOIN users
+    WHERE username = :u
+    """)
+  result = flask.g.db.execute(query, u=username).first()
+  return tuple(result) if result is not None else None
+
+@request_memoized
 def get_user_info(username):
   """Retrieves a user's info."""
   query = sqlalchemy.text("""
@@ -73,6 +116,7 @@ def get_user_info(username):
     """)
   return flask.g.db.execute(query, u=username).first()
 
+@request_memoized
 def get_office_info(username):
   """Procedure to get a user's officer info."""
   query = sqlalchemy.text("""
@@ -83,6 +127,7 @@ def get_office_info(username):
   """)
   return flask.g.db.execute(query, u=username).fetchall()
 
+@request_memoized
 def get_all_grad_years():
     """ Returns a list of strings of all graduation years with no dupliacates """
     query = "SELECT graduation_year FROM members NATURAL JOIN members_extra"
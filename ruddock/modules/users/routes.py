@@ -4,12 +4,15 @@ import flask
 import sqlalchemy
 
 from ruddock import auth_utils
+from ruddock import http_cache_utils
 from ruddock.decorators import login_required
 from ruddock.modules.users import blueprint, helpers
 
 @blueprint.route('/list', defaults={'search_type': 'all'})
 @blueprint.route('/list/<search_type>')
 @login_required()
+@http_cache_utils.conditional(
+    lambda search_type: helpers.get_memberlist_version())
 def show_memberlist(search_type):
   """
   Displays the member list. Optionally filters for only current students
@@ -30,6 +33,7 @@ def show_memberlist(search_type):
 
 @blueprint.route('/view/<username>')
 @login_required()
+@http_cache_utils.conditional(helpers.get_profile_version)
 def view_profile(username):
   """Procedure to show a user's profile and membership details."""
   user_info = helpers.get_user_info(username)
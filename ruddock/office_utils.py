@@ -1,6 +1,8 @@
 import flask
 import sqlalchemy
 
+from ruddock.cache_utils import reference_data, request_memoized
+
 # Template for queries (to reduce redundancy).
 # Remainder of FROM clause and optional WHERE clause is customizable.
 BASE_ASSIGNMENT_QUERY = """
@@ -16,33 +18,46 @@ FROM office_assignments
 ORDER BY office_order, start_date, name
 """
 
+# WHERE clauses selecting current, past and future assignments. These filter
+# office_assignments directly (rather than joining the views of the same names)
+# so that the assignment_dates index can be used.
+ASSIGNMENT_FILTERS = {
+  "current": "WHERE start_date < NOW() AND end_date > NOW()",
+  "past": "WHERE start_date < NOW() AND end_date < NOW()",
+  "future": "WHERE start_date > NOW()",
+}
+
+@request_memoized
 def get_current_assignments():
   """
   Gets all current office assignments. Also gets additional information
   including name and username.
   """
   query = sqlalchemy.text(BASE_ASSIGNMENT_QUERY.format(
-    "NATURAL JOIN office_assignments_current"))
+    ASSIGNMENT_FILTERS["current"]))
   return flask.g.db.execute(query).fetchall()
 
+@request_memoized
 def get_past_assignments():
   """
   Gets all past office assignments. Also gets additional information
   including name and username.
   """
   query = sqlalchemy.text(BASE_ASSIGNMENT_QUERY.format(
-    "NATURAL JOIN office_assignments_past"))
+    ASSIGNMENT_FILTERS["past"]))
   return flask.g.db.execute(query).fetchall()
 
+@request_memoized
 def get_future_assignments():
   """
   Gets all future office assignments. Also gets additional information
   including name and username.
   """
   query = sqlalchemy.text(BASE_ASSIGNMENT_QUERY.format(
-    "NATURAL JOIN office_assignments_future"))
+    ASSIGNMENT_FILTERS["future"]))
   return flask.g.db.execute(query).fetchall()
 
+@request_memoized
 def get_all_assignments():
   """
   Gets all office assignments. Also gets additional information
@@ -51,6 +66,7 @@ def get_all_assignments():
   query = sqlalchemy.text(BASE_ASSIGNMENT_QUERY.format(''))
   return flask.g.db.execute(query).fetchall()
 
+@reference_data("offices")
 def get_all_offices():
   """
   Gets all available offices.
@@ -64,6 +80,7 @@ def get_all_offices():
     """)
   return flask.g.db.execute(query).fetchall()
 
+@request_memoized
 def get_assignment(assignment_id):
   """
   Loads details for the requested assignment. Returns None if no valid
@@ -0,0 +1,123 @@
+"""
+This module instruments every statement executed through the database engine.
+During a request, each statement is recorded in flask.g.queries along with the
+shape of its parameters, the number of rows it returned or touched, and how long
+it took. Statements slower than the SLOW_QUERY_THRESHOLD config value are also
+written to the slow query log as JSON.
+"""
+
+import json
+import logging
+import time
+import flask
+import sqlalchemy
+
+slow_query_log = logging.getLogger("ruddock.slow_queries")
+# File handler installed by set_slow_query_log_file(), if any.
+_slow_query_handler = None
+# Callables that are passed every QueryRecord as it is recorded.
+listeners = []
+
+class QueryRecord:
+  """Details about a single executed statement."""
+  def __init__(self, statement, params_shape, row_count, duration):
+    self.statement = statement
+    self.params_shape = params_shape
+    self.row_count = row_count
+    # Wall time, in seconds.
+    self.duration = duration
+
+  def as_dict(self):
+    return {
+      'statement': self.statement,
+      'params_shape': self.params_shape,
+      'row_count': self.row_count,
+      'duration_ms': round(self.duration * 1000, 3),
+    }
+
+def get_params_shape(parameters, executemany):
+  """
+  Describes the parameters of a statement without including their values
+  (which may contain passwords and other private data). For executemany calls,
+  the number of parameter sets is included as well.
+  """
+  if executemany:
+    parameters = list(parameters)
+    shape = get_params_shape(parameters[0], False) if parameters else []
+    return {'rows': len(parameters), 'params': shape}
+  if not parameters:
+    return []
+  if isinstance(parameters, dict):
+    return sorted(parameters.keys())
+  return len(parameters)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+    executemany):
+  conn.info.setdefault('query_start_times', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+    executemany):
+  duration = time.perf_counter() - conn.info['query_start_times'].pop()
+  # Statements are only recorded while handling a request (or inside an
+  # application context, as the tests do).
+  if not flask.has_app_context():
+    return
+  record = QueryRecord(
+      ' '.join(statement.split()),
+      get_params_shape(parameters, executemany),
+      cursor.rowcount,
+      duration)
+  if 'queries' not in flask.g:
+    flask.g.queries = []
+  flask.g.queries.append(record)
+  for listener in listeners:
+    listener(record)
+
+  threshold = flask.current_app.config.get("SLOW_QUERY_THRESHOLD")
+  if threshold is not None and duration >= threshold:
+    entry = record.as_dict()
+    if flask.has_request_context():
+      entry['endpoint'] = flask.request.endpoint
+      entry['path'] = flask.request.path
+    slow_query_log.warning(json.dumps(entry, sort_keys=True))
+
+def set_slow_query_log_file(filename):
+  """Writes the slow query log to the provided file instead of any earlier one."""
+  global _slow_query_handler
+  if _slow_query_handler is not None:
+    slow_query_log.removeHandler(_slow_query_handler)
+    _slow_query_handler.close()
+  _slow_query_handler = logging.FileHandler(filename)
+  _slow_query_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+  slow_query_log.addHandler(_slow_query_handler)
+
+def instrument_engine(engine):
+  """Registers the instrumentation hooks on the provided engine."""
+  sqlalchemy.event.listen(engine, "before_cursor_execute",
+      _before_cursor_execute)
+  sqlalchemy.event.listen(engine, "after_cursor_execute",
+      _after_cursor_execute)
+
+def get_queries():
+  """Returns the list of statements recorded so far in this context."""
+  return flask.g.get('queries', [])
+
+def get_query_summary():
+  """Returns the number of statements recorded and their total wall time."""
+  queries = get_queries()
+  return {
+    'count': len(queries),
+    'duration': sum(query.duration for query in queries),
+  }
+
+def format_server_timing(request_duration=None):
+  """
+  Formats the recorded statements as a Server-Timing header value, so browser
+  developer tools can show how much of a page load was spent in the database.
+  """
+  summary = get_query_summary()
+  metrics = ['db;desc="{0} queries";dur={1:.3f}'.format(
+      summary['count'], summary['duration'] * 1000)]
+  if request_duration is not None:
+    metrics.append('total;dur={0:.3f}'.format(request_duration * 1000))
+  return ', '.join(metrics)
@@ -1,3 +1,7 @@
+import bisect
+import heapq
+import itertools
+
 def parse_keywords(query):
   """
   Parses the string for keywords. Returns a set of keywords, which contains no
@@ -37,3 +41,110 @@ def count_matches(data_keywords, query_keywords, partial_keywords=[]):
           used_partial_keywords.add(partial_keyword)
           break
   return matches
+
+class KeywordIndex:
+  """
+  An inverted index mapping each keyword to the IDs of the items containing it.
+  Keywords are also kept in sorted order, so that all keywords starting with a
+  partial keyword can be found with a binary search.
+  """
+  def __init__(self, items):
+    """Builds the index from an iterable of (item_id, text) pairs."""
+    self.postings = {}
+    for item_id, text in items:
+      for keyword in parse_keywords(text):
+        self.postings.setdefault(keyword, set()).add(item_id)
+    self.keywords = sorted(self.postings)
+
+  def get_exact_matches(self, keyword):
+    """Returns the set of item IDs containing the keyword."""
+    return self.postings.get(keyword, set())
+
+  def get_prefix_matches(self, partial_keyword):
+    """Returns the set of item IDs containing a keyword with this prefix."""
+    results = set()
+    start = bisect.bisect_left(self.keywords, partial_keyword)
+    for keyword in itertools.islice(self.keywords, start, None):
+      if not keyword.startswith(partial_keyword):
+        break
+      results |= self.postings[keyword]
+    return results
+
+  def _match_required_keywords(self, query_keywords):
+    """
+    Returns the set of item IDs containing every keyword except the last one
+    exactly, or None if there is only one keyword.
+    """
+    last_keyword = query_keywords[-1]
+    # Intersect the rarest keywords first to keep intermediate sets small.
+    exact_keywords = sorted(set(query_keywords[:-1]) - {last_keyword},
+        key=lambda keyword: len(self.get_exact_matches(keyword)))
+
+    results = None
+    for keyword in exact_keywords:
+      matches = self.get_exact_matches(keyword)
+      results = set(matches) if results is None else results & matches
+      if not results:
+        break
+    return results
+
+  def search(self, query):
+    """
+    Returns the set of item IDs matching every keyword in the query. The last
+    keyword may be a partial match (to handle the case where the user is still
+    typing).
+    """
+    query_keywords = query.lower().split()
+    if len(query_keywords) < 1:
+      return set()
+    results = self._match_required_keywords(query_keywords)
+    prefix_matches = self.get_prefix_matches(query_keywords[-1])
+    return set(prefix_matches) if results is None else results & prefix_matches
+
+  def ranked_search(self, query, limit=None, offset=0, key=None,
+      predicate=None):
+    """
+    Searches like search(), but returns a list of item IDs ordered from best to
+    worst match. Items where the last keyword is an exact match rank above items
+    where it is only a prefix match; ties are ordered by key (a function of the
+    item ID, defaulting to the ID itself).
+
+    Only items for which predicate(item_id) is true are returned, if provided.
+    At most limit results are returned after skipping the first offset results.
+    Once enough exact matches are found, prefix matches are never looked up.
+    """
+    query_keywords = query.lower().split()
+    if len(query_keywords) < 1 or limit == 0:
+      return []
+    if key is None:
+      key = lambda item_id: item_id
+    required = self._match_required_keywords(query_keywords)
+    if required is not None and not required:
+      return []
+    last_keyword = query_keywords[-1]
+
+    needed = None if limit is None else offset + limit
+    results = []
+    seen = set()
+    # Each tier scores lower than the one before it.
+    tiers = (
+      lambda: self.get_exact_matches(last_keyword),
+      lambda: self.get_prefix_matches(last_keyword),
+    )
+    for get_tier in tiers:
+      matches = get_tier() - seen
+      if required is not None:
+        matches &= required
+      seen |= matches
+      if predicate is not None:
+        matches = [x for x in matches if predicate(x)]
+      if needed is None:
+        results.extend(sorted(matches, key=key))
+      else:
+        # Only the best few matches in this tier can make it into the results.
+        results.extend(heapq.nsmallest(needed - len(results), matches, key=key))
+        if len(results) >= needed:
+          break
+    if limit is None:
+      return results[offset:]
+    return results[offset:offset + limit]
@@ -1,13 +1,19 @@
 import flask
 import pytest
-import sqlalchemy
 
 import ruddock
 from ruddock import app
+from ruddock import db_utils
+from ruddock import email_utils
+from ruddock.testing.query_budget import QueryBudget
+from ruddock.testing.smtp_sink import SMTPSink
 
 @pytest.yield_fixture
-def client():
+def client(tmpdir, monkeypatch):
   """Use the client fixture to test requests to the application."""
+  # Start every test with an empty email spool.
+  monkeypatch.setattr(ruddock.config.TEST, "email_spool_dir",
+      str(tmpdir.join("email_spool")))
   ruddock.init("test")
   # Specify a server name (needed for url building in the test client).
   app.config["SERVER_NAME"] = "127.0.0.1"
@@ -15,10 +21,31 @@ def client():
   # Establish application context before running tests.
   ctx = app.app_context()
   ctx.push()
-  # Create database engine object.
-  engine = sqlalchemy.create_engine(app.config["DB_URI"], convert_unicode=True)
-  # Connect to the database and publish it in flask.g
-  flask.g.db = engine.connect()
+  # Publish a database connection in flask.g
+  flask.g.db = db_utils.LazyConnection()
 
   yield app.test_client()
   flask.g.db.close()
+
+@pytest.fixture
+def query_budget():
+  """
+  Use the query_budget fixture to limit the statements a request may run:
+
+  with query_budget(max_queries=4, max_repeats=1):
+    client.get(...)
+  """
+  return QueryBudget
+
+@pytest.fixture
+def smtp_sink(monkeypatch):
+  """
+  Use the smtp_sink fixture to capture emails instead of sending them. Queued
+  emails are delivered in the background, so flush the queue before checking:
+
+  email_utils.get_queue().flush()
+  assert len(smtp_sink.messages) == 1
+  """
+  sink = SMTPSink()
+  monkeypatch.setattr(email_utils, "connect_smtp", sink.connect)
+  return sink
@@ -0,0 +1,85 @@
+"""
+Tools for catching routes that run too many queries, such as helpers that
+query the database inside a Python loop (the N+1 query problem).
+
+Example usage (see the query_budget fixture):
+
+with query_budget(max_queries=4, max_repeats=1):
+  client.get(flask.url_for('hassle.run_hassle'))
+
+The test fails if the request runs more than 4 statements, or runs any
+statement shape more than once.
+"""
+
+import collections
+import re
+
+from ruddock import query_utils
+
+# Literals that vary between otherwise identical statements.
+_number_regex = re.compile(r"\b\d+(\.\d+)?\b")
+_string_regex = re.compile(r"'(?:[^'\\]|\\.)*'")
+_in_list_regex = re.compile(r"\bIN\s*\((\s*\?\s*,)*\s*\?\s*\)", re.I)
+
+def get_statement_shape(statement):
+  """
+  Normalizes a statement so that statements differing only in their literals
+  (or in the length of an IN list) have the same shape.
+  """
+  shape = _string_regex.sub("?", statement)
+  shape = shape.replace("%s", "?")
+  shape = _number_regex.sub("?", shape)
+  shape = _in_list_regex.sub("IN (?)", shape)
+  return " ".join(shape.split())
+
+class QueryBudget:
+  """
+  Context manager that records every statement executed while it is active and
+  checks them against a budget when it exits.
+
+  max_queries: maximum number of statements allowed, or None for no limit.
+  max_repeats: maximum number of times a single statement shape may be
+    executed, or None for no limit.
+  """
+  def __init__(self, max_queries=None, max_repeats=None):
+    self.max_queries = max_queries
+    self.max_repeats = max_repeats
+    self.queries = []
+
+  def __enter__(self):
+    self.queries = []
+    query_utils.listeners.append(self.queries.append)
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    query_utils.listeners.remove(self.queries.append)
+    # Don't hide an exception raised inside the block.
+    if exc_type is None:
+      self.check()
+    return False
+
+  @property
+  def count(self):
+    return len(self.queries)
+
+  def get_shape_counts(self):
+    """Returns a Counter mapping statement shapes to times executed."""
+    return collections.Counter(
+        get_statement_shape(query.statement) for query in self.queries)
+
+  def check(self):
+    """Raises an AssertionError if the recorded statements exceed the budget."""
+    errors = []
+    if self.max_queries is not None and self.count > self.max_queries:
+      errors.append("{0} statements were executed (budget is {1}).".format(
+          self.count, self.max_queries))
+    if self.max_repeats is not None:
+      for shape, count in self.get_shape_counts().most_common():
+        if count <= self.max_repeats:
+          break
+        errors.append("Statement was executed {0} times (limit is {1}): {2}"
+            .format(count, self.max_repeats, shape))
+    if errors:
+      statements = "\n".join("  " + query.statement for query in self.queries)
+      raise AssertionError("Query budget exceeded:\n{0}\nStatements:\n{1}"
+          .format("\n".join(errors), statements))
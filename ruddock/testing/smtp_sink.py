@@ -0,0 +1,54 @@
+"""
+A stand-in for an SMTP server, so tests can check which emails were sent
+without a mail server. Pass SMTPSink.connect wherever a connection factory is
+expected (the smtp_sink fixture does this for email_utils).
+"""
+
+import email
+import smtplib
+import threading
+
+class SMTPSink:
+  """
+  Records every message sent over its connections. Deliveries can be made to
+  fail with fail_next(), to exercise retries.
+  """
+  def __init__(self):
+    self._lock = threading.Lock()
+    # List of (from address, to addresses, email.message.Message) tuples.
+    self.messages = []
+    self.connections = 0
+    self.failures = 0
+
+  def fail_next(self, count=1):
+    """Makes the next count deliveries fail."""
+    with self._lock:
+      self.failures += count
+
+  def connect(self):
+    """Returns a new connection to the sink."""
+    with self._lock:
+      self.connections += 1
+    return SinkConnection(self)
+
+  def record(self, from_addr, to_addrs, msg):
+    with self._lock:
+      if self.failures > 0:
+        self.failures -= 1
+        raise smtplib.SMTPServerDisconnected("Simulated failure.")
+      self.messages.append((from_addr, to_addrs, email.message_from_string(msg)))
+
+class SinkConnection:
+  """Implements the parts of smtplib.SMTP that email_utils uses."""
+  def __init__(self, sink):
+    self.sink = sink
+
+  def sendmail(self, from_addr, to_addrs, msg):
+    self.sink.record(from_addr, to_addrs, msg)
+    return {}
+
+  def quit(self):
+    pass
+
+  def close(self):
+    pass
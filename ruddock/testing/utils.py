@@ -1,3 +1,8 @@
+from ruddock import auth_utils
+
+# User ID for the simulated test user. No real member has this ID.
+TEST_USER_ID = -1
+
 def login(session):
   """
   Simulates a login by manually adding values to the session variable provided.
@@ -9,7 +14,9 @@ def login(session):
   You can now send requests as if you were logged in.
   """
   session['username'] = 'test_user'
+  session['user_id'] = TEST_USER_ID
   session['permissions'] = []
+  auth_utils.permission_cache.set(TEST_USER_ID, frozenset())
   return
 
 def add_permission(session, permission):
@@ -17,4 +24,7 @@ def add_permission(session, permission):
   Adds a permission to the session variable provided.
   """
   session['permissions'].append(int(permission))
+  # Permissions are checked against the server-side cache, so prime it.
+  auth_utils.permission_cache.set(session['user_id'],
+      frozenset(session['permissions']))
   return
@@ -0,0 +1,65 @@
+"""
+This module provides token bucket rate limiting. Each key (for example a
+username or an IP address) gets a bucket holding up to capacity tokens, which
+refills at a fixed rate; an action is allowed only if a token can be taken.
+
+Bucket state is kept in a store object. MemoryStore keeps it in this process's
+memory, so every WSGI process enforces its limits separately. Any object with a
+compatible take() method can be used instead to share state between processes.
+"""
+
+import collections
+import threading
+import time
+
+class ThrottledError(Exception):
+  """Raised when an action is attempted too often."""
+  pass
+
+class MemoryStore:
+  """
+  Keeps bucket state in memory. At most max_keys buckets are kept; when there
+  are more, the least recently used buckets are forgotten (which refills
+  them, so this errs on the side of allowing actions).
+  """
+  def __init__(self, max_keys=10000):
+    self.max_keys = max_keys
+    self._lock = threading.Lock()
+    # Maps keys to (tokens, last update time) tuples, least recently used
+    # first.
+    self._buckets = collections.OrderedDict()
+
+  def take(self, key, capacity, rate, now):
+    """
+    Refills the bucket for key at rate tokens per second up to capacity, then
+    tries to take one token. Returns True if a token was taken.
+    """
+    with self._lock:
+      tokens, updated = self._buckets.pop(key, (capacity, now))
+      tokens = min(capacity, tokens + (now - updated) * rate)
+      allowed = tokens >= 1
+      if allowed:
+        tokens -= 1
+      self._buckets[key] = (tokens, now)
+      if len(self._buckets) > self.max_keys:
+        self._buckets.popitem(last=False)
+      return allowed
+
+  def clear(self):
+    """Forgets every bucket."""
+    with self._lock:
+      self._buckets.clear()
+
+class Throttle:
+  """
+  Allows bursts of up to capacity actions per key, refilling at rate actions
+  per second.
+  """
+  def __init__(self, capacity, rate, store=None):
+    self.capacity = capacity
+    self.rate = rate
+    self.store = store if store is not None else MemoryStore()
+
+  def allow(self, key):
+    """Returns True if the action for key is allowed, using up a token."""
+    return self.store.take(key, self.capacity, self.rate, time.monotonic())
@@ -0,0 +1,47 @@
+"""
+Checks the stored budget and account totals (budget_budgets.spent and
+budget_accounts.posted_amount) against totals computed from every expense and
+payment, and prints any that have drifted. With --rebuild, every stored total
+is recomputed from scratch instead (run this after adding the columns, or after
+changing expenses or payments by hand).
+
+Exits with status 1 if drift was found (and not rebuilt).
+
+usage: python budget_totals.py --env ENV [--rebuild]
+"""
+
+import argparse
+import flask
+import sys
+
+import ruddock
+from ruddock import db_utils
+from ruddock.modules.budget import helpers
+
+parser = argparse.ArgumentParser(
+  description="Verify or rebuild stored budget and account totals.")
+
+parser.add_argument("--env", default="dev",
+  help="Environment to run application in. Can be 'prod', 'dev', or 'test'. "
+      + "Default is 'dev'.")
+parser.add_argument("--rebuild", action="store_true",
+  help="Recompute every stored total instead of only checking them.")
+
+if __name__ == "__main__":
+  args = parser.parse_args()
+  ruddock.init(args.env)
+
+  with ruddock.app.app_context():
+    flask.g.db = db_utils.LazyConnection()
+    if args.rebuild:
+      helpers.rebuild_totals()
+      print("Rebuilt all budget and account totals.")
+    drift = helpers.get_total_drift()
+    for kind, row_id, name, stored, actual in drift:
+      print("{0} {1} ({2}): stored {3}, actual {4}".format(
+        kind, row_id, name, stored, actual))
+    flask.g.db.close()
+
+  if len(drift) > 0:
+    sys.exit(1)
+  print("All totals are correct.")
@@ -0,0 +1,149 @@
+"""
+Finds every SQL query written as a string literal passed to sqlalchemy.text()
+in the website's code, runs EXPLAIN on it, and prints the queries which scan a
+whole table. Bind parameters are replaced with placeholder values, so this
+only shows which indexes MySQL is able to use, not the plan for real values.
+
+Queries built at runtime (for example with str.format) can't be checked and
+are listed as skipped. Full scans of tables with fewer than --min-rows rows
+(by MySQL's estimate) are not reported, since small reference tables are
+cheapest to scan. Run this against a database with realistic data.
+
+Exits with status 1 if any full scans were found.
+
+usage: python check_query_plans.py --env ENV [--min-rows N] [--verbose]
+"""
+
+import argparse
+import ast
+import os
+import re
+import sqlalchemy
+import sys
+try:
+  from ruddock import config
+except ImportError:
+  from ruddock import default_config as config
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    "..", "ruddock")
+# Statements which EXPLAIN can be run on.
+EXPLAINABLE = re.compile(r"^\(*\s*(SELECT|UPDATE|DELETE)\b", re.IGNORECASE)
+# Bind parameters, bind parameters used as LIMIT or OFFSET (which must be
+# numbers), and expanding bind parameters (which are lists).
+BIND_PARAM = re.compile(r"(?<![:\w\\]):(\w+)")
+NUMERIC_BIND_PARAM = re.compile(r"\b(LIMIT|OFFSET)(\s+)\(?:\w+\)?",
+    re.IGNORECASE)
+EXPANDING_BIND_PARAM = re.compile(r"\bIN(\s+):\w+", re.IGNORECASE)
+
+parser = argparse.ArgumentParser(
+  description="Check query plans for full table scans.")
+
+parser.add_argument("--env", default="dev",
+  help="Environment to run application in. Can be 'prod', 'dev', or 'test'. "
+      + "Default is 'dev'.")
+parser.add_argument("--min-rows", type=int, default=100,
+  help="Only report scans of tables with at least this many rows. "
+      + "Default is 100.")
+parser.add_argument("--verbose", action="store_true",
+  help="Also print skipped queries and queries that couldn't be explained.")
+
+def get_string(node):
+  """Returns the value of a string literal node, or None."""
+  if hasattr(ast, "Constant") and isinstance(node, ast.Constant):
+    return node.value if isinstance(node.value, str) else None
+  if isinstance(node, getattr(ast, "Str", ())):
+    return node.s
+  return None
+
+def is_text_call(node):
+  """Returns True if node is a call of sqlalchemy.text() or text()."""
+  if not isinstance(node, ast.Call):
+    return False
+  func = node.func
+  if isinstance(func, ast.Attribute):
+    return (func.attr == "text" and isinstance(func.value, ast.Name)
+        and func.value.id == "sqlalchemy")
+  return isinstance(func, ast.Name) and func.id == "text"
+
+def find_queries(source_dir):
+  """
+  Returns a list of (location, query) for every sqlalchemy.text() call in the
+  Python files under source_dir, where query is None if it isn't a literal.
+  """
+  queries = []
+  for root, dirs, files in os.walk(source_dir):
+    dirs.sort()
+    for filename in sorted(files):
+      if not filename.endswith(".py"):
+        continue
+      path = os.path.join(root, filename)
+      with open(path) as source_file:
+        tree = ast.parse(source_file.read(), path)
+      for node in ast.walk(tree):
+        if is_text_call(node) and len(node.args) > 0:
+          location = "{0}:{1}".format(
+              os.path.relpath(path, source_dir), node.lineno)
+          queries.append((location, get_string(node.args[0])))
+  queries.sort(key=lambda q: (q[0].split(":")[0], int(q[0].split(":")[1])))
+  return queries
+
+def fill_parameters(query):
+  """Replaces bind parameters with placeholder values."""
+  query = NUMERIC_BIND_PARAM.sub(r"\1\g<2>1", query)
+  query = EXPANDING_BIND_PARAM.sub(r"IN\1('1')", query)
+  return BIND_PARAM.sub("'1'", query).replace(r"\:", ":")
+
+def get_full_scans(db, query, min_rows):
+  """Returns the EXPLAIN rows of the query which scan a whole table."""
+  transaction = db.begin()
+  try:
+    plan = db.execute(sqlalchemy.text(
+        "EXPLAIN " + fill_parameters(query).replace(":", r"\:"))).fetchall()
+  finally:
+    transaction.rollback()
+  return [row for row in plan
+      if row["type"] == "ALL" and (row["rows"] or 0) >= min_rows]
+
+if __name__ == "__main__":
+  args = parser.parse_args()
+  if args.env == "prod" and hasattr(config, "PROD"):
+    db_uri = config.PROD.db_uri
+  elif args.env == "dev" and hasattr(config, "DEV"):
+    db_uri = config.DEV.db_uri
+  elif args.env == "test" and hasattr(config, "TEST"):
+    db_uri = config.TEST.db_uri
+  else:
+    raise ValueError("Illegal environment name.")
+
+  engine = sqlalchemy.create_engine(db_uri, convert_unicode=True)
+  db = engine.connect()
+  checked = 0
+  skipped = 0
+  failed = 0
+  scans = 0
+  for location, query in find_queries(SOURCE_DIR):
+    if query is None or not EXPLAINABLE.match(query.strip()):
+      skipped += 1
+      if args.verbose:
+        print("{0}: skipped".format(location))
+      continue
+    try:
+      full_scans = get_full_scans(db, query, args.min_rows)
+    except sqlalchemy.exc.DBAPIError as e:
+      failed += 1
+      if args.verbose:
+        print("{0}: could not explain: {1}".format(location, e.orig))
+      continue
+    checked += 1
+    for row in full_scans:
+      scans += 1
+      print("{0}: full scan of {1} (~{2} rows)".format(
+        location, row["table"], row["rows"]))
+  db.close()
+
+  print("Checked {0} queries ({1} skipped, {2} could not be explained).".format(
+    checked, skipped, failed))
+  if scans > 0:
+    print("Found {0} full table scans.".format(scans))
+    sys.exit(1)
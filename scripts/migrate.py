@@ -0,0 +1,123 @@
+"""
+Applies numbered schema migrations to the database. Migrations are SQL files
+in database/migrations named NNNN_description.sql, and are applied in order
+of their number. Each applied migration is recorded in the schema_migrations
+table (which is created if it doesn't exist yet), so running this again only
+applies new migrations.
+
+A database created from database/schema.sql already records every migration
+the schema includes. When adding a migration, also make the change in
+schema.sql and add it to the list at the end of that file.
+
+MySQL can't roll back schema changes, so if a migration fails part way
+through, fix the database by hand before running this again.
+
+usage: python migrate.py --env ENV [--list | --dry-run]
+"""
+
+import argparse
+import os
+import re
+import sqlalchemy
+try:
+  from ruddock import config
+except ImportError:
+  from ruddock import default_config as config
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    "..", "database", "migrations")
+MIGRATION_FILE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+parser = argparse.ArgumentParser(
+  description="Apply schema migrations.")
+
+parser.add_argument("--env", default="dev",
+  help="Environment to run application in. Can be 'prod', 'dev', or 'test'. "
+      + "Default is 'dev'.")
+parser.add_argument("--list", action="store_true",
+  help="List every migration and whether it has been applied.")
+parser.add_argument("--dry-run", action="store_true",
+  help="Print the statements of pending migrations without running them.")
+
+def get_migrations():
+  """Returns a sorted list of (version, name, path) for every migration."""
+  migrations = []
+  for filename in os.listdir(MIGRATIONS_DIR):
+    match = MIGRATION_FILE.match(filename)
+    if match is not None:
+      migrations.append((int(match.group(1)), match.group(2),
+        os.path.join(MIGRATIONS_DIR, filename)))
+  migrations.sort()
+  versions = [m[0] for m in migrations]
+  if len(set(versions)) != len(versions):
+    raise ValueError("Two migrations have the same number.")
+  return migrations
+
+def split_statements(sql):
+  """
+  Splits the contents of a migration file into statements. Comment lines are
+  removed, and statements must end with a semicolon at the end of a line.
+  """
+  lines = [line for line in sql.splitlines()
+      if not line.strip().startswith("--")]
+  statements = re.split(r";\s*$", "\n".join(lines), flags=re.MULTILINE)
+  return [s.strip() for s in statements if s.strip() != ""]
+
+def get_applied_versions(db):
+  """Returns the set of migration versions which have been applied."""
+  db.execute(sqlalchemy.text("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+      version INTEGER NOT NULL,
+      name VARCHAR(255) NOT NULL,
+      applied_at DATETIME NOT NULL,
+      PRIMARY KEY (version)
+    )
+    """))
+  query = sqlalchemy.text("SELECT version FROM schema_migrations")
+  return set(row["version"] for row in db.execute(query))
+
+def apply_migration(db, version, name, path):
+  """Runs every statement in a migration, then records it as applied."""
+  with open(path) as migration_file:
+    statements = split_statements(migration_file.read())
+  for statement in statements:
+    # Don't treat colons in the SQL as bind parameters.
+    db.execute(sqlalchemy.text(statement.replace(":", r"\:")))
+  query = sqlalchemy.text("""
+    INSERT INTO schema_migrations (version, name, applied_at)
+    VALUES (:v, :n, NOW())
+    """)
+  db.execute(query, v=version, n=name)
+
+if __name__ == "__main__":
+  args = parser.parse_args()
+  if args.env == "prod" and hasattr(config, "PROD"):
+    db_uri = config.PROD.db_uri
+  elif args.env == "dev" and hasattr(config, "DEV"):
+    db_uri = config.DEV.db_uri
+  elif args.env == "test" and hasattr(config, "TEST"):
+    db_uri = config.TEST.db_uri
+  else:
+    raise ValueError("Illegal environment name.")
+
+  engine = sqlalchemy.create_engine(db_uri, convert_unicode=True)
+  db = engine.connect()
+  applied = get_applied_versions(db)
+  pending = [m for m in get_migrations() if m[0] not in applied]
+
+  if args.list:
+    for version, name, path in get_migrations():
+      status = "applied" if version in applied else "pending"
+      print("{0:04d} {1} ({2})".format(version, name, status))
+  elif args.dry_run:
+    for version, name, path in pending:
+      print("-- {0:04d} {1}".format(version, name))
+      with open(path) as migration_file:
+        for statement in split_statements(migration_file.read()):
+          print(statement + ";")
+  else:
+    for version, name, path in pending:
+      print("Applying {0:04d} {1}...".format(version, name))
+      apply_migration(db, version, name, path)
+    print("Applied {0} migration(s).".format(len(pending)))
+  db.close()
@@ -6,6 +6,8 @@ another character (I used a space). In the future we should
 probably use another character as a delimiter...
 You will need to manually add any preferred names, as well as
 the dinner values for each prefrosh.
+The website caches the bucket list, so restart it after running this (or
+wait constants.REFERENCE_DATA_TTL seconds) before computing buckets.
 
 usage: python rotation_setup.py --env ENV /path/to/images/
 """
@@ -68,11 +68,11 @@ if __name__ == "__main__":
   for (office_id, lst) in lists:
     query = text("""
       SELECT email
-      FROM office_assignments_current
-        NATURAL JOIN office_assignments
+      FROM office_assignments
         NATURAL JOIN offices
         NATURAL JOIN members
       WHERE office_id = :oid
+        AND start_date < NOW() AND end_date > NOW()
     """)
     results = connection.execute(query, oid=office_id).fetchall()
     updateFromList(results, lst)
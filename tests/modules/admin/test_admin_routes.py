@@ -4,6 +4,7 @@ Tests routes in the admin module.
 
 import flask
 import http.client
+import json
 
 from ruddock import auth_utils
 from ruddock.resources import Permissions
@@ -17,3 +18,24 @@ def test_admin_home(client):
     utils.add_permission(session, Permissions.ADMIN)
   response = client.get(flask.url_for('admin.admin_home'))
   assert response.status_code == http.client.OK
+
+def test_pool_stats(client):
+  """Tests the /admin/ajax/pool_stats route."""
+  with client.session_transaction() as session:
+    utils.login(session)
+    utils.add_permission(session, Permissions.ADMIN)
+  response = client.get(flask.url_for('admin.ajax_get_pool_stats'))
+  assert response.status_code == http.client.OK
+  stats = json.loads(response.data.decode())
+  assert stats['pool_size'] == 5
+  assert stats['checked_out'] == 0
+
+def test_search_members(client):
+  """Tests that member search results are ranked and limited."""
+  with client.session_transaction() as session:
+    utils.login(session)
+    utils.add_permission(session, Permissions.USERS)
+  response = client.get(flask.url_for('admin.ajax_search_members',
+      query='princess', limit=2))
+  assert response.status_code == http.client.OK
+  assert json.loads(response.data.decode()) == [4, 8]
@@ -0,0 +1,46 @@
+"""
+Tests ruddock/modules/admin/member_helpers.py.
+"""
+
+import io
+
+from ruddock.modules.admin import member_helpers
+from ruddock.testing.fixtures import client, query_budget
+
+def test_set_member_types(client, query_budget):
+  """Tests that membership types are resolved with a single query."""
+  descs = ['full', 'Resident Associate', 'Social', 'nope']
+  new_member_list = member_helpers.NewMemberList([
+      member_helpers.NewMember('First', 'Last', '2020', '2024',
+        '123456789{}'.format(i), 'test@example.com', desc)
+      for i, desc in enumerate(descs)])
+  with query_budget(max_queries=1):
+    new_member_list.set_member_types()
+  members = new_member_list.new_member_list
+  assert [m.member_type for m in members] == [1, 4, 2, None]
+  assert [m.membership_desc for m in members] == \
+      ['Full', 'RA', 'Social', 'nope']
+
+def test_parse_csv_file(client):
+  """Tests parsing an uploaded CSV file."""
+  csv_file = io.BytesIO(
+      b'\xef\xbb\xbfFirst Name,Last Name,Matriculation Year,Graduation Year,'
+      b'UID,Email,Membership Type (Full/Social/RA)\r\n'
+      b'Rainbow, Dash ,2020,2024,1234567,dash@example.com,Full,,\r\n'
+      b'\r\n'
+      b'"Pinkie",Pie,2020,2024,7654321,pinkie@example.com,Social\r\n')
+  new_member_list = member_helpers.NewMemberList()
+  assert new_member_list.parse_csv_file(csv_file)
+  assert [str(m) for m in new_member_list.new_member_list] == [
+      'Rainbow,Dash,2020,2024,1234567,dash@example.com,Full',
+      'Pinkie,Pie,2020,2024,7654321,pinkie@example.com,Social']
+
+def test_parse_csv_file_multiline_field(client):
+  """Tests that a quoted field containing a newline stays in one record."""
+  csv_file = io.BytesIO(
+      b'Rainbow,"Dash\r\nJr.",2020,2024,1234567,dash@example.com,Full\r\n'
+      b'Pinkie,Pie,2020,2024,7654321,pinkie@example.com,Social\r\n')
+  new_member_list = member_helpers.NewMemberList()
+  assert new_member_list.parse_csv_file(csv_file)
+  assert [m.last_name for m in new_member_list.new_member_list] == [
+      'Dash\r\nJr.', 'Pie']
@@ -0,0 +1,22 @@
+"""
+Tests routes in the budget module.
+"""
+
+import flask
+import http.client
+
+from ruddock.resources import Permissions
+from ruddock.testing import utils
+from ruddock.testing.fixtures import client
+
+def test_empty_ledger_pages(client):
+  """Tests that paging past either end of the ledgers shows an empty page."""
+  with client.session_transaction() as session:
+    utils.login(session)
+    utils.add_permission(session, Permissions.BUDGET)
+  for endpoint in ['budget.route_expenses', 'budget.route_payments']:
+    for page in [{'before': 1}, {'after': 1000000}]:
+      response = client.get(flask.url_for(endpoint, **page))
+      assert response.status_code == http.client.OK
+      assert b'>Older<' not in response.data
+      assert b'>Newer<' not in response.data
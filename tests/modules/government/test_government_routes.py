@@ -5,10 +5,19 @@ Tests routes in the government module.
 import flask
 import http.client
 
-from ruddock.testing.fixtures import client
+from ruddock.modules.government import helpers
+from ruddock.testing.fixtures import client, query_budget
 
-def test_government(client):
+def test_government(client, query_budget):
   """Tests the /government route."""
-  response = client.get(flask.url_for('government.government_home'))
+  helpers.invalidate_offices_page()
+  with query_budget(max_queries=2):
+    response = client.get(flask.url_for('government.government_home'))
   assert response.status_code == http.client.OK
+  # The list of offices is cached, and can be revalidated with its ETag.
+  etag = response.headers['ETag']
+  with query_budget(max_queries=0):
+    response = client.get(flask.url_for('government.government_home'),
+        headers={'If-None-Match': etag})
+  assert response.status_code == http.client.NOT_MODIFIED
 
@@ -7,12 +7,13 @@ import http.client
 
 from ruddock.resources import Permissions
 from ruddock.testing import utils
-from ruddock.testing.fixtures import client
+from ruddock.testing.fixtures import client, query_budget
 
-def test_run_hassle(client):
+def test_run_hassle(client, query_budget):
   """Tests /hassle route."""
   with client.session_transaction() as session:
     utils.login(session)
     utils.add_permission(session, Permissions.HASSLE)
-  response = client.get(flask.url_for('hassle.run_hassle'))
+  with query_budget(max_queries=4, max_repeats=1):
+    response = client.get(flask.url_for('hassle.run_hassle'))
   assert response.status_code == http.client.OK
@@ -0,0 +1,37 @@
+"""
+Tests helpers in the rotation module.
+"""
+
+import random
+
+from ruddock.modules.rotation import helpers
+
+def nearest_bucket(avg, buckets):
+  """Straightforward linear search for the nearest bucket."""
+  best_match_idx = 0
+  best_error = 100000
+  for i in buckets:
+    error = abs(avg - buckets[i])
+    if (error < best_error) or (error == best_error and avg < buckets[i]):
+      best_error = error
+      best_match_idx = i
+  return best_match_idx
+
+def test_assign_buckets():
+  """Tests that assign_buckets matches a linear search for every prefrosh."""
+  buckets = {i + 1: float(name) for i, name in enumerate(helpers.BUCKETS)}
+  rows = []
+  for prefrosh_id in range(200):
+    row = {'prefrosh_id': prefrosh_id}
+    for t in helpers.VOTE_TUPLES:
+      row[t['vote_string']] = random.randint(0, 4)
+    rows.append(row)
+  # An exact tie between the 2 and 3 buckets goes to the higher one.
+  tie = {t['vote_string']: 0 for t in helpers.VOTE_TUPLES}
+  tie.update({'prefrosh_id': 200, 'votes_plus_three': 3})
+  rows.append(tie)
+
+  assignments = helpers.assign_buckets(rows, buckets)
+  for row in rows:
+    expected = nearest_bucket(helpers.smoothed_average(row), buckets)
+    assert assignments[row['prefrosh_id']] == expected
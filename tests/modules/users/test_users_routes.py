@@ -7,20 +7,41 @@ import sqlalchemy
 import http.client
 
 from ruddock.testing import utils
-from ruddock.testing.fixtures import client
+from ruddock.testing.fixtures import client, query_budget
 
-def test_show_memberlist(client):
+def test_show_memberlist(client, query_budget):
   """Tests /members route."""
   with client.session_transaction() as session:
     utils.login(session)
-  response = client.get(flask.url_for('users.show_memberlist'))
+  with query_budget(max_queries=3, max_repeats=1):
+    response = client.get(flask.url_for('users.show_memberlist'))
   assert response.status_code == http.client.OK
+  etag = response.headers['ETag']
+  # Unchanged, the list is revalidated with only the version query.
+  with query_budget(max_queries=1):
+    response = client.get(flask.url_for('users.show_memberlist'),
+        headers={'If-None-Match': etag})
+  assert response.status_code == http.client.NOT_MODIFIED
+  # Renaming a membership type changes the list.
+  query = sqlalchemy.text("""
+    UPDATE membership_types
+    SET membership_desc = :d
+    WHERE member_type = 1
+    """)
+  flask.g.db.execute(query, d='Full Member (Renamed)')
+  try:
+    response = client.get(flask.url_for('users.show_memberlist'),
+        headers={'If-None-Match': etag})
+    assert response.status_code == http.client.OK
+  finally:
+    flask.g.db.execute(query, d='Full Member')
 
-def test_view_profile(client):
+def test_view_profile(client, query_budget):
   """Tests that viewing a user works."""
   username = "twilight"
   with client.session_transaction() as session:
     utils.login(session)
-  response = client.get(
-      flask.url_for('users.view_profile', username=username))
+  with query_budget(max_queries=3, max_repeats=1):
+    response = client.get(
+        flask.url_for('users.view_profile', username=username))
   assert response.status_code == http.client.OK
@@ -9,6 +9,7 @@ import hashlib
 from ruddock import auth_utils
 from ruddock import misc_utils
 from ruddock import constants
+from ruddock.resources import Permissions
 from ruddock.testing.fixtures import client
 
 def test_hash_password():
@@ -86,3 +87,12 @@ def test_is_full_member(client):
   assert auth_utils.is_full_member('dashie') # Full
   assert not auth_utils.is_full_member('luna') # Social
   assert not auth_utils.is_full_member('buford') # not a user
+
+def test_permission_cache(client):
+  """Tests that cached permissions are used until they are invalidated."""
+  auth_utils.invalidate_permissions()
+  assert auth_utils.get_permissions(1) == frozenset()
+  auth_utils.permission_cache.set(1, frozenset([Permissions.ADMIN]))
+  assert auth_utils.get_permissions(1) == frozenset([Permissions.ADMIN])
+  auth_utils.invalidate_permissions(1)
+  assert auth_utils.get_permissions(1) == frozenset()
@@ -0,0 +1,67 @@
+"""
+Tests ruddock/cache_utils.py.
+"""
+
+import flask
+import sqlalchemy
+
+from ruddock import cache_utils
+from ruddock.testing.fixtures import client
+
+calls = []
+
+@cache_utils.request_memoized
+def get_membership_desc(member_type):
+  calls.append(member_type)
+  query = sqlalchemy.text("""
+    SELECT membership_desc
+    FROM membership_types
+    WHERE member_type = :m
+    """)
+  return flask.g.db.execute(query, m=member_type).scalar()
+
+def test_request_memoized(client):
+  """Tests that results are remembered per argument until a write."""
+  del calls[:]
+  cache_utils.clear_request_memo()
+  assert get_membership_desc(1) == 'Full Member'
+  assert get_membership_desc(1) == 'Full Member'
+  assert get_membership_desc(member_type=2) == 'Social Member'
+  assert get_membership_desc(2) == 'Social Member'
+  assert calls == [1, 2]
+  # Any write clears remembered results.
+  flask.g.db.execute(sqlalchemy.text(
+      "UPDATE membership_types SET membership_desc = membership_desc"))
+  assert get_membership_desc(1) == 'Full Member'
+  assert calls == [1, 2, 1]
+
+def test_reference_data():
+  """Tests that results are shared until their table is invalidated."""
+  loaded = []
+
+  @cache_utils.reference_data("rooms")
+  def get_alley(room_number):
+    loaded.append(room_number)
+    return room_number // 10
+
+  assert get_alley(31) == 3
+  assert get_alley(room_number=31) == 3
+  assert loaded == [31]
+  # Invalidating an unrelated table keeps the result.
+  cache_utils.invalidate_reference_data("offices")
+  assert get_alley(31) == 3
+  assert loaded == [31]
+  cache_utils.invalidate_reference_data("rooms")
+  assert get_alley(31) == 3
+  assert loaded == [31, 31]
+
+def test_cache_max_keys():
+  """Tests that a bounded cache forgets its least recently used entries."""
+  cache = cache_utils.Cache(60, max_keys=2)
+  cache.set('a', 1)
+  cache.set('b', 2)
+  assert cache.get('a') == 1
+  cache.set('c', 3)
+  assert cache.get('b') is None
+  assert cache.get('a') == 1
+  assert cache.get('c') == 3
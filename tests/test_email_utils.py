@@ -0,0 +1,52 @@
+"""
+Tests ruddock/email_utils.py.
+"""
+import os
+
+from ruddock import constants
+from ruddock import email_utils
+from ruddock.testing.fixtures import smtp_sink
+
+def test_email_queue(smtp_sink, tmpdir):
+  """Tests that queued emails are delivered over one connection."""
+  queue = email_utils.EmailQueue(str(tmpdir))
+  for i in range(3):
+    queue.enqueue("user{}@example.com".format(i), "Message {}".format(i))
+  assert queue.flush(5)
+  assert [m[1] for m in smtp_sink.messages] == \
+      [["user0@example.com"], ["user1@example.com"], ["user2@example.com"]]
+  assert smtp_sink.connections == 1
+  # Delivered emails are removed from the spool.
+  assert os.listdir(str(tmpdir)) == []
+
+def test_email_queue_retry(smtp_sink, tmpdir, monkeypatch):
+  """Tests that failed deliveries are retried, then given up on."""
+  monkeypatch.setattr(constants, "EMAIL_RETRY_DELAY", 0.01)
+  queue = email_utils.EmailQueue(str(tmpdir))
+  smtp_sink.fail_next(2)
+  queue.enqueue("user@example.com", "Message")
+  assert queue.flush(5)
+  assert len(smtp_sink.messages) == 1
+  assert queue.retried == 2
+  # Each failure starts over with a new connection.
+  assert smtp_sink.connections == 3
+
+  smtp_sink.fail_next(constants.EMAIL_MAX_ATTEMPTS)
+  queue.enqueue("user@example.com", "Message")
+  assert queue.flush(5)
+  assert queue.failed == 1
+  assert len(smtp_sink.messages) == 1
+  assert [name[-7:] for name in os.listdir(str(tmpdir))] == [".failed"]
+
+def test_email_queue_recover(smtp_sink, tmpdir):
+  """Tests that messages abandoned in the spool are delivered."""
+  abandoned = email_utils.EmailQueue(str(tmpdir))
+  abandoned._spool({'id': 'old', 'to': 'user@example.com',
+      'message': 'Message', 'attempts': 1})
+  queue = email_utils.EmailQueue(str(tmpdir))
+  # Recently written messages belong to a running process.
+  assert queue.recover(60) == 0
+  assert queue.recover(0) == 1
+  assert queue.flush(5)
+  assert len(smtp_sink.messages) == 1
+  assert os.listdir(str(tmpdir)) == []
@@ -0,0 +1,31 @@
+"""
+Tests ruddock/hash_utils.py.
+"""
+import threading
+import pytest
+
+from ruddock import hash_utils
+
+def test_hash_pool():
+  """Tests that a full hashing pool rejects new jobs instead of queueing."""
+  pool = hash_utils.HashPool(workers=1, max_queue=0)
+  started = threading.Event()
+  finish = threading.Event()
+  def slow_job():
+    started.set()
+    finish.wait()
+    return "slow"
+
+  results = []
+  thread = threading.Thread(target=lambda: results.append(pool.run(slow_job)))
+  thread.start()
+  started.wait()
+  with pytest.raises(hash_utils.HashPoolFullError):
+    pool.run(len, "abc")
+  finish.set()
+  thread.join()
+  assert results == ["slow"]
+  # The slot is released once the job finishes.
+  assert pool.run(len, "abc") == 3
+  assert pool.in_flight == 0
+  pool.shutdown()
@@ -0,0 +1,31 @@
+"""
+Tests ruddock/http_cache_utils.py.
+"""
+import flask
+import http.client
+
+from ruddock.testing import utils
+from ruddock.testing.fixtures import client
+
+def test_etag_depends_on_user(client):
+  """Tests that a page's ETag can't be reused after logging in."""
+  url = flask.url_for('government.government_home')
+  response = client.get(url)
+  etag = response.headers['ETag']
+  assert 'no-cache' in response.headers['Cache-Control']
+  assert client.get(url, headers={'If-None-Match': etag}).status_code \
+      == http.client.NOT_MODIFIED
+  with client.session_transaction() as session:
+    utils.login(session)
+  response = client.get(url, headers={'If-None-Match': etag})
+  assert response.status_code == http.client.OK
+  assert 'private' in response.headers['Cache-Control']
+
+def test_constitution_revalidated(client):
+  """Tests that browsers must revalidate the constitution."""
+  response = client.get(flask.url_for('static',
+      filename='constitution/constitution.pdf'))
+  assert response.status_code == http.client.OK
+  assert 'no-cache' in response.headers['Cache-Control']
+  assert 'max-age' not in response.headers['Cache-Control']
+  response.close()
@@ -0,0 +1,16 @@
+"""
+Tests ruddock/member_utils.py.
+"""
+
+from ruddock import member_utils
+from ruddock.testing.fixtures import client
+
+def test_search_members_by_name(client):
+  """Tests searching the member name index."""
+  member_utils.invalidate_member_index()
+  # Results are ordered by name.
+  assert member_utils.search_members_by_name("princess") == [4, 8, 3, 1]
+  assert member_utils.search_members_by_name("princess lu") == [3]
+  # Members without a graduation year are neither current nor alumni.
+  assert member_utils.search_members_by_name("princess", "alumni") == [4, 3, 1]
+  assert member_utils.search_members_by_name("nobody") == []
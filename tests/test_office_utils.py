@@ -0,0 +1,21 @@
+"""
+Tests ruddock/office_utils.py.
+"""
+import flask
+import sqlalchemy
+
+from ruddock import office_utils
+from ruddock.testing.fixtures import client
+
+def test_assignment_queries_use_index(client):
+  """
+  Tests that the current, past and future assignment queries can find
+  assignments with the assignment_dates index instead of scanning the table.
+  """
+  for condition in office_utils.ASSIGNMENT_FILTERS.values():
+    query = sqlalchemy.text("EXPLAIN " +
+        office_utils.BASE_ASSIGNMENT_QUERY.format(condition))
+    plan = flask.g.db.execute(query).fetchall()
+    rows = [row for row in plan if row['table'] == 'office_assignments']
+    assert len(rows) == 1
+    assert 'assignment_dates' in (rows[0]['possible_keys'] or '').split(',')
@@ -0,0 +1,35 @@
+"""
+Tests ruddock/testing/query_budget.py.
+"""
+import pytest
+
+from ruddock.query_utils import QueryRecord
+from ruddock.testing.query_budget import QueryBudget, get_statement_shape
+
+def make_budget(statements, **kwargs):
+  """Returns a QueryBudget that has recorded the provided statements."""
+  budget = QueryBudget(**kwargs)
+  budget.queries = [QueryRecord(s, [], 1, 0.001) for s in statements]
+  return budget
+
+def test_get_statement_shape():
+  """Tests that statements differing only in literals share a shape."""
+  assert get_statement_shape("SELECT name FROM members WHERE user_id = 4") \
+      == get_statement_shape("SELECT  name FROM members\nWHERE user_id = %s")
+  assert get_statement_shape("SELECT 1 FROM rooms WHERE alley IN (%s, %s)") \
+      == get_statement_shape("SELECT 1 FROM rooms WHERE alley IN (%s)")
+  assert get_statement_shape("SELECT 1 FROM users WHERE username = 'a'") \
+      != get_statement_shape("SELECT 1 FROM members WHERE uid = 'a'")
+
+def test_query_budget():
+  """Tests that budgets fail on too many statements or repeated shapes."""
+  statements = [
+    "SELECT name FROM members WHERE user_id = %s",
+    "SELECT name FROM members WHERE user_id = %s",
+    "SELECT room_number FROM rooms",
+  ]
+  make_budget(statements, max_queries=3, max_repeats=2).check()
+  with pytest.raises(AssertionError):
+    make_budget(statements, max_queries=2).check()
+  with pytest.raises(AssertionError):
+    make_budget(statements, max_repeats=1).check()
@@ -0,0 +1,27 @@
+"""
+Tests ruddock/query_utils.py.
+"""
+import flask
+import http.client
+
+from ruddock import query_utils
+from ruddock.modules.government import helpers as government_helpers
+from ruddock.testing.fixtures import client
+
+def test_get_params_shape():
+  """Tests that parameter shapes never include parameter values."""
+  assert query_utils.get_params_shape({'u': 'secret', 'a': 1}, False) \
+      == ['a', 'u']
+  assert query_utils.get_params_shape(('secret',), False) == 1
+  assert query_utils.get_params_shape((), False) == []
+  assert query_utils.get_params_shape([{'p': 1}, {'p': 2}], True) \
+      == {'rows': 2, 'params': ['p']}
+
+def test_server_timing(client):
+  """Tests that responses report time spent in the database."""
+  # Start with an empty cache, so that the page loads the current assignments
+  # and when they next change.
+  government_helpers.invalidate_offices_page()
+  response = client.get(flask.url_for('government.government_home'))
+  assert response.status_code == http.client.OK
+  assert response.headers['Server-Timing'].startswith('db;desc="2 queries"')
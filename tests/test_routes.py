@@ -5,6 +5,7 @@ Tests routes that are not in a module.
 import flask
 import http.client
 
+from ruddock import db_utils
 from ruddock.testing.fixtures import client
 
 def test_home(client):
@@ -16,3 +17,13 @@ def test_contact(client):
   """Tests the /contact route."""
   response = client.get(flask.url_for('show_contact'))
   assert response.status_code == http.client.OK
+
+def test_home_skips_database(client):
+  """Tests that pages without queries never check out a connection."""
+  db_utils.pool_stats.reset()
+  response = client.get(flask.url_for('home'))
+  assert response.status_code == http.client.OK
+  stats = db_utils.pool_stats.as_dict()
+  assert stats['requests'] == 1
+  assert stats['requests_with_db'] == 0
+  assert stats['checkouts'] == 0
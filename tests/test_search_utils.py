@@ -0,0 +1,43 @@
+"""
+Tests ruddock/search_utils.py.
+"""
+
+from ruddock import search_utils
+
+def test_keyword_index():
+  """Tests exact and partial keyword matching in KeywordIndex."""
+  index = search_utils.KeywordIndex([
+    (1, "Princess Twilight Sparkle"),
+    (2, "Rainbow Dash"),
+    (3, "Princess Luna"),
+    (4, "Princess Celestia"),
+  ])
+  assert index.search("princess") == {1, 3, 4}
+  assert index.search("PRINCESS lu") == {3}
+  assert index.search("spark") == {1}
+  assert index.search("twilight princess") == {1}
+  # Only the last keyword may be a partial match.
+  assert index.search("prin luna") == set()
+  assert index.search("dash rainbow cel") == set()
+  assert index.search("") == set()
+
+def test_ranked_search():
+  """Tests ordering, limits, and offsets in KeywordIndex.ranked_search."""
+  index = search_utils.KeywordIndex([
+    (1, "Princess Twilight Sparkle"),
+    (2, "Rainbow Dash"),
+    (3, "Princess Luna"),
+    (4, "Lunar Eclipse"),
+    (5, "Luna Lovegood"),
+  ])
+  # Exact matches on the last keyword rank above prefix matches.
+  assert index.ranked_search("luna") == [3, 5, 4]
+  assert index.ranked_search("lun") == [3, 4, 5]
+  assert index.ranked_search("luna", limit=2) == [3, 5]
+  assert index.ranked_search("luna", limit=2, offset=1) == [5, 4]
+  assert index.ranked_search("luna", offset=2) == [4]
+  assert index.ranked_search("luna", limit=0) == []
+  assert index.ranked_search("luna", key=lambda x: -x) == [5, 3, 4]
+  assert index.ranked_search("luna", predicate=lambda x: x != 5) == [3, 4]
+  assert index.ranked_search("princess lun") == [3]
+  assert index.ranked_search("nobody lun") == []
@@ -0,0 +1,31 @@
+"""
+Tests ruddock/throttle_utils.py.
+"""
+
+from ruddock import throttle_utils
+
+def test_memory_store():
+  """Tests that buckets allow bursts and then refill at the given rate."""
+  store = throttle_utils.MemoryStore()
+  # Burst of 3, refilling one token every 10 seconds.
+  assert [store.take("a", 3, 0.1, 0) for _ in range(4)] == \
+      [True, True, True, False]
+  # Other keys have their own bucket.
+  assert store.take("b", 3, 0.1, 0)
+  assert not store.take("a", 3, 0.1, 5)
+  assert store.take("a", 3, 0.1, 15)
+  assert not store.take("a", 3, 0.1, 15)
+  # Buckets never hold more than capacity tokens.
+  assert [store.take("a", 3, 0.1, 1000) for _ in range(4)] == \
+      [True, True, True, False]
+
+def test_memory_store_eviction():
+  """Tests that the least recently used buckets are forgotten."""
+  store = throttle_utils.MemoryStore(max_keys=2)
+  assert store.take("a", 1, 0, 0)
+  assert store.take("b", 1, 0, 0)
+  assert not store.take("a", 1, 0, 0)
+  # Adding a third key evicts "b", the least recently used.
+  assert store.take("c", 1, 0, 0)
+  assert store.take("b", 1, 0, 0)
+  assert not store.take("c", 1, 0, 0)